@@ -0,0 +1,126 @@
+from Models.light_vehicles import LightVehicle
+from Models.network import NetworkVehicle
+from Models.vehicles import Vehicle
+
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+
+class PoissonArrivals:
+    """
+    Poisson arrival process whose progress (next vehicle id and random
+    stream) lives on the object, so it can be checkpointed and resumed.
+    Start it with start(); random_arrivals runs the same process without
+    keeping the object.
+
+    Args:
+        env: SimPy environment
+        intersection: Intersection instance
+        rate: mean number of arrivals per time unit
+        rng: random.Random instance, so every replication owns its stream
+        prio_share: probability that a vehicle is a priority vehicle
+        vehicles: optional list that created vehicles are appended to
+        lightweight: create LightVehicles driven by the intersection instead
+            of Vehicles with a process each
+        next_id: id of the next vehicle created
+    """
+
+    def __init__(self, env, intersection, rate, rng, prio_share=0.2, vehicles=None, lightweight=False, next_id=1):
+        self.env = env
+        self.intersection = intersection
+        self.rate = rate
+        self.rng = rng
+        self.prio_share = prio_share
+        self.vehicles = vehicles
+        self.lightweight = lightweight
+        self.next_id = next_id
+        self.process = None
+
+    def start(self, event=None):
+        """Start the arrival process; a restored one first waits for `event`"""
+        self.process = self.env.process(self.run(event))
+        return self.process
+
+    def run(self, event=None):
+        env, intersection, rng = self.env, self.intersection, self.rng
+        while True:
+            yield event if event is not None else env.timeout(rng.expovariate(self.rate))
+            event = None
+
+            source = rng.choice(DIRECTIONS)
+            destination = rng.choice([d for d in DIRECTIONS if d != source])
+            prio = 1 if rng.random() < self.prio_share else 0
+
+            if self.lightweight:
+                vehicle = LightVehicle(id=self.next_id, at=env.now, source=source, destination=destination, prio=prio)
+                intersection.admit(vehicle)
+            else:
+                vehicle = Vehicle(env=env, id=self.next_id, at=env.now, source=source,
+                                  destination=destination, intersection=intersection, prio=prio)
+            if self.vehicles is not None:
+                self.vehicles.append(vehicle)
+            self.next_id += 1
+
+
+def random_arrivals(env, intersection, rate, rng, prio_share=0.2, vehicles=None, lightweight=False):
+    """
+    Generator process creating vehicles with Poisson arrivals, see
+    PoissonArrivals for the arguments.
+    """
+    return PoissonArrivals(env, intersection, rate, rng, prio_share, vehicles, lightweight).run()
+
+
+def trace_arrivals(env, intersection, records, vehicles=None, lightweight=False):
+    """
+    Generator process replaying a trace of (time, source, destination, prio)
+    records, e.g. from traces.read_trace. Records are consumed one at a time
+    and every vehicle is only created when it arrives.
+
+    Args:
+        env: SimPy environment
+        intersection: Intersection instance
+        records: iterable of records in non-decreasing time order
+        vehicles: optional list that created vehicles are appended to
+        lightweight: create LightVehicles driven by the intersection instead
+            of Vehicles with a process each
+    """
+    vehicle_id = 1
+    last_time = None
+    for time, source, destination, prio in records:
+        if last_time is not None and time < last_time:
+            raise ValueError(f"trace is not in time order: record {vehicle_id} at {time} after {last_time}")
+        last_time = time
+        if time > env.now:
+            yield env.timeout(time - env.now)
+
+        if lightweight:
+            vehicle = LightVehicle(id=vehicle_id, at=env.now, source=source, destination=destination, prio=prio)
+            intersection.admit(vehicle)
+        else:
+            vehicle = Vehicle(env=env, id=vehicle_id, at=env.now, source=source,
+                              destination=destination, intersection=intersection, prio=prio)
+        if vehicles is not None:
+            vehicles.append(vehicle)
+        vehicle_id += 1
+
+
+def random_trips(env, network, rate, rng, prio_share=0.2, vehicles=None):
+    """
+    Generator process starting NetworkVehicle trips with Poisson arrivals.
+    Trips enter and leave the network through its unconnected (boundary) sides.
+    """
+    boundary = network.boundary_sides()
+    vehicle_id = 1
+    while True:
+        yield env.timeout(rng.expovariate(rate))
+
+        origin, entry_dir = rng.choice(boundary)
+        target, exit_dir = rng.choice(boundary)
+        while (target, exit_dir) == (origin, entry_dir):
+            target, exit_dir = rng.choice(boundary)
+        prio = 1 if rng.random() < prio_share else 0
+
+        vehicle = NetworkVehicle(vehicle_id, origin, entry_dir, target, exit_dir, prio=prio)
+        network.add_vehicle(vehicle)
+        if vehicles is not None:
+            vehicles.append(vehicle)
+        vehicle_id += 1
@@ -0,0 +1,231 @@
+"""
+Checkpoint and restore of a running Intersection.
+
+checkpoint() captures, between two events, everything the rest of a run
+depends on:
+- the queued and crossing vehicles
+- which request holds and which wait for every light
+- the round-robin controller's progress
+- the lanes' service loops
+- the arrival process with its random stream
+- the metrics collected so far
+The result is a compressed pickle. restore() rebuilds it in a fresh
+environment that starts at the checkpoint time, so a warm-up is simulated
+once and any number of what-if branches can start from it.
+
+Pending timeouts are recreated in their original (time, priority, event id)
+order at exactly their original times, so the restored run processes the
+same events in the same order and continues bit-identically.
+
+Supported runs: LightVehicles admitted to a single-lane Intersection driven
+by a RoundRobinController (or its exclusive variant), fed by PoissonArrivals
+started with start() or by nothing. Checkpoints are pickles; only restore ones you wrote.
+"""
+import heapq
+import pickle
+import random
+import zlib
+from collections import deque
+
+import simpy
+
+from Models.arrivals import PoissonArrivals
+from Models.controllers import DIRECTIONS, RoundRobinController, RoundRobinState
+from Models.intersection import Intersection
+from Models.light_vehicles import LightVehicle
+
+VERSION = 1
+
+_VEHICLE_FIELDS = ('id', 'arrival_time', 'source', 'destination', 'prio', 'crossing_time',
+                   'wait_start_time', 'wait_end_time', 'wt', 'status')
+# stands for the red request of a light in the users/queue of a light
+_RED = 'red'
+
+
+def checkpoint(intersection, arrivals=None):
+    """
+    Return the state of `intersection` (and the PoissonArrivals feeding it)
+    as bytes. Take it between events, e.g. after env.run(until=...).
+    """
+    env = intersection.env
+    if not isinstance(intersection.controller, RoundRobinController):
+        raise ValueError("only intersections driven by the RoundRobinController can be checkpointed")
+    if list(intersection.traffic_lights) != DIRECTIONS or intersection.saturation_flow is not None:
+        raise ValueError("only intersections with one lane per approach and the default saturation flow "
+                         "can be checkpointed")
+
+    # which vehicle every light request belongs to, as (direction, queue position)
+    vehicle_refs = {}
+    queues = {}
+    for direction, queue in intersection.queues.items():
+        records = []
+        for position, vehicle in enumerate(queue):
+            if not isinstance(vehicle, LightVehicle):
+                raise ValueError("only LightVehicles admitted with Intersection.admit can be checkpointed")
+            records.append(tuple(getattr(vehicle, name) for name in _VEHICLE_FIELDS))
+            if vehicle.request is not None:
+                vehicle_refs[vehicle.request] = (direction, position)
+        queues[direction] = records
+
+    lights = {}
+    for direction, light in intersection.traffic_lights.items():
+        red = intersection.red_lights.get(direction)
+
+        def ref(request):
+            return _RED if request is red else vehicle_refs[request]
+
+        lights[direction] = {
+            'users': [ref(request) for request in light.users],
+            'queue': [ref(request) for request in light.put_queue],
+            # a released red request stays in red_lights until the next one
+            'red_released': red is not None and red not in light.users and red not in light.put_queue,
+        }
+
+    # the pending timeouts, in the order the environment would process them,
+    # each tagged with the process waiting for it
+    owners = {intersection.scheduler_process: ('controller',)}
+    for direction, process in intersection.lane_processes.items():
+        owners[process] = ('lane', direction)
+    if arrivals is not None:
+        if arrivals.process is None:
+            raise ValueError("start the arrivals with PoissonArrivals.start() to checkpoint them")
+        owners[arrivals.process] = ('arrivals',)
+
+    events = []
+    # the environment has no public view of its event queue
+    for time, priority, _, event in sorted(env._queue, key=lambda entry: entry[:3]):
+        if not event.callbacks:
+            # triggered event nobody waits for, processing it changes nothing
+            continue
+        process = getattr(event.callbacks[0], '__self__', None)
+        owner = owners.get(process)
+        if owner is None or not isinstance(event, simpy.Timeout) or len(event.callbacks) > 1:
+            raise ValueError(f"cannot checkpoint at time {env.now}: {event!r} pending at {time} "
+                             f"does not belong to the intersection or its arrivals")
+        events.append((time, owner))
+
+    metrics = None
+    if intersection.metrics is not None:
+        on_snapshot, intersection.metrics.on_snapshot = intersection.metrics.on_snapshot, None
+        try:
+            metrics = pickle.dumps(intersection.metrics, pickle.HIGHEST_PROTOCOL)
+        finally:
+            intersection.metrics.on_snapshot = on_snapshot
+
+    s = intersection.controller_state
+    state = {
+        'version': VERSION,
+        'now': env.now,
+        'wake_on_arrival': intersection.wake_on_arrival,
+        'time_quantum': intersection.time_quantum,
+        'controller': intersection.controller,
+        'controller_state': {name: getattr(s, name) for name in RoundRobinState.__slots__},
+        'queues': queues,
+        'queue_prio': dict(intersection.queue_prio),
+        'lights': lights,
+        'light_states': dict(intersection.light_states),
+        'arrival_triggered': intersection.arrival_event.triggered,
+        'lanes': {direction: intersection.lane_wakeup[direction].triggered for direction in intersection.pending},
+        'events': events,
+        'arrivals': None if arrivals is None else {
+            'rate': arrivals.rate,
+            'prio_share': arrivals.prio_share,
+            'lightweight': arrivals.lightweight,
+            'next_id': arrivals.next_id,
+            'rng_state': arrivals.rng.getstate(),
+        },
+        'metrics': metrics,
+    }
+    return zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+
+def restore(data, log=None):
+    """
+    Rebuild a checkpoint in a new environment starting at the checkpoint
+    time. Returns (env, intersection, arrivals); arrivals is None when the
+    checkpoint had none. Vehicles created afterwards are not appended to any
+    `vehicles` list.
+    """
+    state = pickle.loads(zlib.decompress(data))
+    if state.get('version') != VERSION:
+        raise ValueError(f"unsupported checkpoint version {state.get('version')}")
+
+    env = simpy.Environment(initial_time=state['now'])
+    metrics = pickle.loads(state['metrics']) if state['metrics'] is not None else None
+    intersection = Intersection(env, wake_on_arrival=state['wake_on_arrival'], log=log, metrics=metrics,
+                                controller=state['controller'], start=False)
+    intersection.time_quantum = state['time_quantum']
+    intersection.queue_prio.update(state['queue_prio'])
+    intersection.light_states.update(state['light_states'])
+
+    for direction, records in state['queues'].items():
+        for record in records:
+            vehicle = LightVehicle(id=record[0], at=record[1], source=record[2], destination=record[3],
+                                   prio=record[4])
+            for name, value in zip(_VEHICLE_FIELDS[5:], record[5:]):
+                setattr(vehicle, name, value)
+            intersection.queues[direction].append(vehicle)
+
+    # recreate the requests in order: the user is granted at once, the rest
+    # queue behind it
+    for direction, light_state in state['lights'].items():
+        light = intersection.traffic_lights[direction]
+        queue = intersection.queues[direction]
+        for ref in light_state['users'] + light_state['queue']:
+            request = light.request()
+            if ref == _RED:
+                intersection.red_lights[direction] = request
+            else:
+                queue[ref[1]].request = request
+        if light_state['red_released']:
+            # only ever released again, which ignores requests it does not hold
+            intersection.red_lights[direction] = object()
+
+    intersection.arrival_event = _event(env, state['arrival_triggered'])
+    for direction, wakeup_triggered in state['lanes'].items():
+        intersection.pending[direction] = deque(v for v in intersection.queues[direction] if v.status == "waiting")
+        intersection.lane_wakeup[direction] = _event(env, wakeup_triggered)
+
+    timeouts = {}
+    times = {}
+    for time, owner in state['events']:
+        timeout = env.timeout(max(0.0, time - env.now))
+        timeouts[owner] = timeout
+        times[timeout] = time
+    # env.now + (time - env.now) does not always round back to time, so put
+    # the original times on the event queue
+    env._queue[:] = [(times.get(event, at), priority, eid, event) for at, priority, eid, event in env._queue]
+    heapq.heapify(env._queue)
+
+    s = RoundRobinState(**state['controller_state'])
+    if s.step in ('red', 'red_preempt'):
+        event = intersection.red_lights[DIRECTIONS[s.index]]
+    elif s.step == 'arrival':
+        event = intersection.arrival_event
+    else:
+        event = timeouts[('controller',)]
+    intersection.scheduler_process = env.process(intersection.controller.run(intersection, s, event))
+
+    for direction in state['lanes']:
+        crossing = next((v for v in intersection.queues[direction] if v.status == "crossing"), None)
+        crossed = timeouts[('lane', direction)] if crossing is not None else None
+        intersection.lane_processes[direction] = env.process(intersection.serve_lane(direction, crossing, crossed))
+
+    arrivals = None
+    if state['arrivals'] is not None:
+        a = state['arrivals']
+        rng = random.Random()
+        rng.setstate(a['rng_state'])
+        arrivals = PoissonArrivals(env, intersection, a['rate'], rng, a['prio_share'],
+                                   lightweight=a['lightweight'], next_id=a['next_id'])
+        arrivals.start(timeouts[('arrivals',)])
+
+    return env, intersection, arrivals
+
+
+def _event(env, triggered):
+    event = env.event()
+    if triggered:
+        event.succeed()
+    return event
+
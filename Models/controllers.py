@@ -0,0 +1,457 @@
+"""
+Signal controllers deciding which approach of an Intersection gets green.
+
+A controller is a small configuration object. Intersection starts exactly
+one process running `controller.run(intersection)`, and the controller
+switches lights only through `intersection.set_green` and
+`intersection.set_red`, which log the change and notify the light
+listeners (the visualizer, for one). All per-run state lives in the
+generator, so one controller instance can drive several intersections.
+
+The lights are capacity-1 resources, one per lane, that vehicles queue on;
+a signal locks all of its lanes while red. The round-robin controller's red
+request queues behind the vehicles already waiting, as it always has. The
+fixed-time, actuated, phase and max-pressure controllers set `strict_red`, which makes
+the lights priority resources so a red request is served as soon as the
+vehicle currently crossing has left.
+
+The fixed-time, actuated and exclusive round-robin controllers give green
+to one approach signal ('N', 'S', 'E', 'W') at a time. The original round
+robin does not: when a quantum is used up it moves on without turning the
+approach red, so up to four conflicting approaches can be green together
+and it serves more than one lane can. Adaptive controllers are compared
+with the exclusive round robin, which only differs in that.
+
+Left-turn signals of intersections with dedicated left-turn lanes are only
+served by the phase and max-pressure controllers; every controller reports
+the signals it serves through served_signals, and an Intersection refuses a
+controller that would leave some signal red forever.
+"""
+import math
+
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+
+class SignalController:
+    # True: red is granted right after the vehicle currently crossing,
+    # False: red waits for every vehicle already queued
+    strict_red = False
+
+    def run(self, intersection):
+        """Generator process switching the lights of `intersection`"""
+        raise NotImplementedError
+
+    def served_signals(self, signals):
+        """The signals among `signals` this controller ever gives green"""
+        return [signal for signal in DIRECTIONS if signal in signals]
+
+
+class RoundRobinState:
+    """
+    Progress of a RoundRobinController run. It is kept in one object instead
+    of generator locals so that a run can be checkpointed and resumed; `step`
+    names what the controller does once the event it waits for fires.
+    """
+
+    __slots__ = ('step', 'index', 'preempt_index', 'time', 'idle_start', 'skipped')
+
+    def __init__(self, step='select', index=0, preempt_index=None, time=0, idle_start=None, skipped=0):
+        self.step = step
+        self.index = index  # current direction
+        self.preempt_index = preempt_index  # result of the last preemption check
+        self.time = time  # ticks into the current green phase, starting at 1
+        self.idle_start = idle_start
+        self.skipped = skipped
+
+
+class RoundRobinController(SignalController):
+    """
+    Visit the approaches in N, S, E, W order and give a non-empty one green
+    for up to time_quantum ticks. Green ends early when its queue runs empty,
+    or hands over to an approach with a higher summed priority. Empty
+    approaches are skipped one tick each, and while every queue is empty the
+    controller sleeps until the next arrival (unless wake_on_arrival is off).
+    """
+
+    # True: turn the current approach red when its quantum is used up
+    exclusive = False
+
+    def __init__(self, time_quantum=None):
+        # None: use intersection.time_quantum
+        self.time_quantum = time_quantum
+
+    def run(self, intersection, state=None, event=None):
+        """
+        Args:
+            state: RoundRobinState to resume from, a fresh one by default
+            event: event the resumed controller is waiting for
+        """
+        env = intersection.env
+        queues = intersection.queues
+        s = intersection.controller_state = state if state is not None else RoundRobinState()
+        if event is not None:
+            yield event
+
+        while True:
+            step = s.step
+            current_direction = DIRECTIONS[s.index]
+
+            if step == 'select':
+                # check if any vehicle is waiting in the current direction
+                if not queues[current_direction]:
+                    if intersection.wake_on_arrival and not any(queues.values()):
+                        # nothing is waiting anywhere: take the first tick
+                        # exactly like the polling loop, so vehicles arriving
+                        # at this very instant are seen at the same tick
+                        s.step = 'idle_tick'
+                        yield env.timeout(1)
+                        continue
+
+                    # if no vehicle is waiting, move to the next direction
+                    s.index = (s.index + 1) % 4
+                    yield env.timeout(1)
+                    continue
+
+                # turn current direction green
+                intersection.set_green(current_direction)
+                s.time = 1
+                s.step = 'green'
+
+            elif step == 'green':
+                if s.time <= (self.time_quantum or intersection.time_quantum):
+                    # run for 1 unit of time
+                    s.step = 'tick'
+                    yield env.timeout(1)
+                    continue
+
+                # quantum used up; set_green leaves the released request in
+                # red_lights, so this direction stays green until one of its
+                # later phases ends early, unless the controller is exclusive
+                if self.exclusive or current_direction not in intersection.red_lights:
+                    s.step = 'red'
+                    yield intersection.request_red(current_direction)
+                    continue
+                self._next_direction(s)
+
+            elif step == 'tick':
+                s.time += 1
+
+                # Skip if no vehicle is waiting
+                if not queues[current_direction]:
+                    s.step = 'red'
+                    yield intersection.request_red(current_direction)
+                    continue
+
+                # check for priority preemption against the current direction
+                current_prio = intersection.queue_prio[current_direction]
+                s.preempt_index = intersection.check_prio_queue(current_prio, current_direction)
+
+                if s.preempt_index is not None:
+                    s.step = 'red_preempt'
+                    yield intersection.request_red(current_direction)
+                    continue
+                s.step = 'green'
+
+            elif step == 'red':
+                intersection.red_granted(current_direction)
+                self._next_direction(s)
+
+            elif step == 'red_preempt':
+                intersection.red_granted(current_direction)
+                s.index = s.preempt_index
+                s.step = 'select'
+
+            elif step == 'idle_tick':
+                if any(queues.values()):
+                    s.index = (s.index + 1) % 4
+                    s.step = 'select'
+                    continue
+
+                # sleep until request_crossing is called
+                s.idle_start = env.now
+                intersection.arrival_event = env.event()
+                s.step = 'arrival'
+                yield intersection.arrival_event
+
+            elif step == 'arrival':
+                # resume on the same 1-tick grid the polling loop would have
+                # used, keeping the round-robin position it would have reached
+                s.skipped = max(1, math.ceil(env.now - s.idle_start))
+                delay = s.idle_start + s.skipped - env.now
+                s.step = 'idle_delay'
+                if delay > 0:
+                    yield env.timeout(delay)
+
+            elif step == 'idle_delay':
+                s.index = (s.index + 1 + s.skipped) % 4
+                s.step = 'select'
+
+    def _next_direction(self, s):
+        # rotate to the next signal, unless the last preemption check (which
+        # may be from an earlier phase) picked one
+        if s.preempt_index is None:
+            s.index = (s.index + 1) % 4
+        s.step = 'select'
+
+
+class ExclusiveRoundRobinController(RoundRobinController):
+    """
+    The round-robin controller with one approach green at a time. The
+    original leaves an approach green when its quantum is used up and moves
+    on, so up to four conflicting approaches can be green together; this
+    one requests red first, which like every round-robin red is granted once
+    the vehicles already queued have crossed.
+    """
+
+    exclusive = True
+
+
+class FixedTimeController(SignalController):
+    """
+    Give every approach in `order` a fixed green of green_time ticks,
+    followed by all_red ticks with every light red, whether or not anybody
+    is waiting.
+    """
+
+    strict_red = True
+
+    def __init__(self, green_time=None, all_red=0, order=DIRECTIONS):
+        # green_time None: use intersection.time_quantum
+        self.green_time = green_time
+        self.all_red = all_red
+        self.order = list(order)
+
+    def served_signals(self, signals):
+        return [signal for signal in self.order if signal in signals]
+
+    def run(self, intersection):
+        env = intersection.env
+        while True:
+            for direction in self.order:
+                intersection.set_green(direction)
+                yield env.timeout(self.green_time or intersection.time_quantum)
+                yield from intersection.set_red(direction)
+                if self.all_red:
+                    yield env.timeout(self.all_red)
+
+
+class ActuatedController(SignalController):
+    """
+    Serve only approaches with vehicles waiting, in N, S, E, W order. Green
+    lasts at least min_green ticks and is extended a tick at a time while
+    vehicles are still queued, up to max_green (gap-out and max-out). With
+    no vehicle anywhere the controller sleeps until the next arrival.
+    """
+
+    strict_red = True
+
+    def __init__(self, min_green=2, max_green=None):
+        # max_green None: use intersection.time_quantum
+        self.min_green = min_green
+        self.max_green = max_green
+
+    def run(self, intersection):
+        env = intersection.env
+        queues = intersection.queues
+        index = 0
+
+        while True:
+            calls = [DIRECTIONS[(index + i) % 4] for i in range(4) if queues[DIRECTIONS[(index + i) % 4]]]
+            if not calls:
+                intersection.arrival_event = env.event()
+                yield intersection.arrival_event
+                continue
+
+            direction = calls[0]
+            intersection.set_green(direction)
+
+            max_green = self.max_green or intersection.time_quantum
+            green = 0
+            while green < max_green:
+                yield env.timeout(1)
+                green += 1
+                if green >= self.min_green and not queues[direction]:
+                    break
+            yield from intersection.set_red(direction)
+
+            index = (DIRECTIONS.index(direction) + 1) % 4
+
+
+def default_phases(signals):
+    """
+    Phases of compatible signals among `signals`, N+S first, then E+W.
+
+    Where both opposing approaches have protected left signals, their
+    through and right traffic runs together (N+S), then both lefts
+    (NL+SL). Otherwise left turns share a lane with, and would cut across,
+    the opposing through traffic, so every approach gets a phase of its own
+    with all its movements (split phasing): N with NL, then S with SL.
+    """
+    phases = []
+    for first, second in (('N', 'S'), ('E', 'W')):
+        if first + 'L' in signals and second + 'L' in signals:
+            phases += [(first, second), (first + 'L', second + 'L')]
+        else:
+            phases += [tuple(s for s in (approach, approach + 'L') if s in signals) for approach in (first, second)]
+    return phases
+
+
+class PhaseController(SignalController):
+    """
+    Actuated control of phases, groups of signals whose movements do not
+    conflict, which turn green and red together. Phases with vehicles
+    waiting are served in turn for min_green to max_green ticks, extended a
+    tick at a time while any of their signals has demand. With no vehicle
+    anywhere the controller sleeps until the next arrival.
+    """
+
+    strict_red = True
+
+    def __init__(self, phases=None, min_green=2, max_green=None):
+        # phases None: default_phases of the intersection's signals,
+        # max_green None: use intersection.time_quantum
+        self.phases = phases
+        self.min_green = min_green
+        self.max_green = max_green
+
+    def served_signals(self, signals):
+        return [signal for phase in self.phases or default_phases(signals) for signal in phase]
+
+    def run(self, intersection):
+        env = intersection.env
+        demand = intersection.demand
+        phases = [tuple(phase) for phase in self.phases or default_phases(intersection.signals)]
+        index = 0
+
+        while True:
+            calls = [phase for phase in phases[index:] + phases[:index] if any(demand[s] for s in phase)]
+            if not calls:
+                intersection.arrival_event = env.event()
+                yield intersection.arrival_event
+                continue
+
+            phase = calls[0]
+            for signal in phase:
+                intersection.set_green(signal)
+
+            max_green = self.max_green or intersection.time_quantum
+            green = 0
+            while green < max_green:
+                yield env.timeout(1)
+                green += 1
+                if green >= self.min_green and not any(demand[s] for s in phase):
+                    break
+
+            yield env.all_of([intersection.request_red(signal) for signal in phase])
+            for signal in phase:
+                intersection.red_granted(signal)
+
+            index = (phases.index(phase) + 1) % len(phases)
+
+
+class MaxPressureController(SignalController):
+    """
+    Adaptive control of the same phases as the PhaseController. At every
+    decision the phase with the highest pressure, the vehicles waiting per
+    lane summed over its signals, gets green; it stays green without a
+    change interval while its pressure is still the highest. A green lasts
+    as long as the longest lane of the phase takes to clear while vehicles
+    keep arriving at the observed rate, queue / (saturation flow - arrival
+    rate), between min_green and max_green.
+
+    Arrival rates are exponentially weighted moving averages, over about
+    rate_window time units, of the arrivals the intersection counts per
+    signal, so a decision costs O(signals) however long the queues are.
+    """
+
+    strict_red = True
+
+    def __init__(self, phases=None, min_green=1, max_green=None, rate_window=60):
+        # phases None: default_phases of the intersection's signals,
+        # max_green None: use intersection.time_quantum, as the other
+        # controllers do; longer greens let one phase hold on to green
+        # while the others' queues grow, which loses to fixed phasing at
+        # high load
+        self.phases = phases
+        self.min_green = min_green
+        self.max_green = max_green
+        self.rate_window = rate_window
+
+    def served_signals(self, signals):
+        return [signal for phase in self.phases or default_phases(signals) for signal in phase]
+
+    def run(self, intersection):
+        env = intersection.env
+        demand = intersection.demand
+        arrived = intersection.arrived
+        lanes = {signal: len(names) for signal, names in intersection.signals.items()}
+        phases = [tuple(phase) for phase in self.phases or default_phases(intersection.signals)]
+        # vehicles a green lane discharges per time unit
+        flow = intersection.saturation_flow or 1.0
+
+        rates = dict.fromkeys(lanes, 0.0)  # arrivals per time unit and lane
+        counted = dict(arrived)
+        last_decision = env.now
+        current = None
+
+        while True:
+            elapsed = env.now - last_decision
+            if elapsed > 0:
+                # weight of the latest interval, by its length
+                weight = 1 - math.exp(-elapsed / self.rate_window)
+                for signal in rates:
+                    observed = (arrived[signal] - counted[signal]) / elapsed / lanes[signal]
+                    rates[signal] += weight * (observed - rates[signal])
+                    counted[signal] = arrived[signal]
+                last_decision = env.now
+
+            # the current phase first, so it keeps green on a tie
+            start = phases.index(current) if current is not None else 0
+            phase = max(phases[start:] + phases[:start],
+                        key=lambda phase: sum(demand[s] / lanes[s] for s in phase))
+
+            if not any(demand[s] for s in phase):
+                if current is not None:
+                    yield from self._red(intersection, current)
+                    current = None
+                intersection.arrival_event = env.event()
+                yield intersection.arrival_event
+                continue
+
+            if phase != current:
+                if current is not None:
+                    yield from self._red(intersection, current)
+                for signal in phase:
+                    intersection.set_green(signal)
+                current = phase
+
+            max_green = self.max_green or intersection.time_quantum
+            green = 0.0
+            for signal in phase:
+                if rates[signal] >= flow:
+                    green = max_green
+                    break
+                green = max(green, demand[signal] / lanes[signal] / (flow - rates[signal]))
+            green = int(min(max_green, max(self.min_green, math.ceil(green))))
+            # decide again once the planned green is over or the phase has
+            # run empty (gap-out)
+            for _ in range(green):
+                yield env.timeout(1)
+                if not any(demand[s] for s in phase):
+                    break
+
+    def _red(self, intersection, phase):
+        yield intersection.env.all_of([intersection.request_red(signal) for signal in phase])
+        for signal in phase:
+            intersection.red_granted(signal)
+
+
+# controllers selectable by name, e.g. from the batch runner
+CONTROLLERS = {
+    'round_robin': RoundRobinController,
+    'round_robin_exclusive': ExclusiveRoundRobinController,
+    'fixed_time': FixedTimeController,
+    'actuated': ActuatedController,
+    'phased': PhaseController,
+    'max_pressure': MaxPressureController,
+}
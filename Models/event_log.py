@@ -0,0 +1,162 @@
+"""
+Structured event log for the simulation.
+
+Models emit events as (time, level, event, fields) through an EventLog, which
+forwards them to a pluggable sink. Call sites guard with ``log.enabled(level)``
+so nothing is built or formatted when logging is off, which is the default.
+
+Sinks:
+    RingBufferSink  keeps the last N events in memory
+    ConsoleSink     prints the human readable messages the demos have always shown
+    JsonlSink       batched JSON lines writer
+    CsvSink         batched CSV writer
+
+read_jsonl reads a JsonlSink file back as the records a RingBufferSink keeps.
+"""
+import csv
+import io
+import json
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO'}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+# union of the fields emitted by Intersection and Vehicle, used as CSV columns
+FIELDS = ('vehicle', 'source', 'destination', 'prio', 'arrival_time', 'direction', 'state', 'value')
+
+
+class EventLog:
+    def __init__(self, sink=None, level=INFO):
+        # sink=None disables logging entirely
+        self.sink = sink
+        self.level = level
+
+    def enabled(self, level=INFO):
+        return self.sink is not None and level >= self.level
+
+    def emit(self, level, time, event, **fields):
+        if self.enabled(level):
+            self.sink.write(time, level, event, fields)
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+
+class RingBufferSink:
+    def __init__(self, capacity=10000):
+        self.events = deque(maxlen=capacity)
+
+    def write(self, time, level, event, fields):
+        self.events.append((time, level, event, fields))
+
+    def records(self):
+        return list(self.events)
+
+    def close(self):
+        pass
+
+
+class ConsoleSink:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, time, level, event, fields):
+        print(format_event(time, event, fields), file=self.stream)
+
+    def close(self):
+        pass
+
+
+class _BatchedFileSink:
+    """Buffers formatted lines and writes them to disk in bulk"""
+
+    def __init__(self, path, batch_size=10000):
+        self.file = open(path, 'w', newline='')
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def write(self, time, level, event, fields):
+        self.buffer.append(self.format(time, level, event, fields))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(''.join(self.buffer))
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlSink(_BatchedFileSink):
+    def format(self, time, level, event, fields):
+        record = {'time': time, 'level': LEVEL_NAMES.get(level, level), 'event': event}
+        record.update(fields)
+        return json.dumps(record) + '\n'
+
+
+class CsvSink(_BatchedFileSink):
+    def __init__(self, path, batch_size=10000):
+        super().__init__(path, batch_size)
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line)
+        self._writer.writerow(('time', 'level', 'event') + FIELDS)
+        self.buffer.append(self._take_line())
+
+    def _take_line(self):
+        line = self._line.getvalue()
+        self._line.seek(0)
+        self._line.truncate()
+        return line
+
+    def format(self, time, level, event, fields):
+        row = [time, LEVEL_NAMES.get(level, level), event]
+        row.extend(fields.get(name, '') for name in FIELDS)
+        self._writer.writerow(row)
+        return self._take_line()
+
+
+def read_jsonl(path):
+    """Yield the (time, level, event, fields) records of a JsonlSink file"""
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            time = record.pop('time')
+            level = record.pop('level')
+            event = record.pop('event')
+            yield time, LEVELS.get(level, level), event, record
+
+
+def format_event(time, event, fields):
+    """Render an event as the message the simulation used to print"""
+    if event == 'arrive':
+        return (f"Vehicle {fields['vehicle']}: {fields['source']}->{fields['destination']} Status waiting, "
+                f"Arrival Time {fields['arrival_time']}, Wait Time 0, Priority {fields['prio']}")
+    if event == 'cross_start':
+        return (f"Time {time:.1f}: Vehicle {fields['vehicle']} starts crossing from "
+                f"{fields['source']} to {fields['destination']}")
+    if event == 'cross_end':
+        return f"Time {time:.1f}: Vehicle {fields['vehicle']} completed crossing"
+    if event == 'dequeue':
+        return f"Time {time:.1f}: Vehicle {fields['vehicle']} removed from {fields['source']} queue"
+    if event == 'light':
+        return f"Time {time:.1f}: Direction : {fields['direction']} turns {fields['state']}"
+    if event == 'preempt':
+        return f"Time {time:.1f}: Priority detected in direction {fields['direction']} with value {fields['value']}"
+
+    details = ', '.join(f"{key}={value}" for key, value in fields.items())
+    return f"Time {time:.1f}: {event} {details}"
@@ -0,0 +1,139 @@
+"""
+Opt-in profiling of where a run spends its wall-clock time.
+
+A Profiler is handed to Intersection (and set on TrafficVisualizer.profiler)
+only when wanted. Intersection then shadows its hot methods with timed
+wrappers on that one instance and wraps its processes, so an intersection
+without a profiler runs exactly the code it always did. Profiler.run counts
+the SimPy events processed.
+
+Timers nest: the controller's time includes the check_prio_queue calls it
+makes, and so on, so shares of the total do not add up to 100%.
+"""
+import time
+from collections import defaultdict
+
+
+class Profiler:
+    def __init__(self):
+        self.counts = defaultdict(int)  # calls per timer or counter
+        self.times = defaultdict(float)  # seconds per timer
+        self.peaks = {}
+        self.events = 0
+        self.wall = 0.0
+
+    def add(self, name, seconds):
+        self.counts[name] += 1
+        self.times[name] += seconds
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def peak(self, name, value):
+        if value > self.peaks.get(name, value - 1):
+            self.peaks[name] = value
+
+    def timed(self, name, function):
+        """Return `function` wrapped to record its calls under `name`"""
+        add = self.add
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(name, perf_counter() - start)
+        return wrapper
+
+    def process(self, name, generator, phase=None):
+        """
+        Wrap a process generator so the time of every resumption is recorded
+        under `name`, or under name.phase() evaluated after the resumption.
+        The wrapper yields exactly the events of `generator`.
+        """
+        add = self.add
+        perf_counter = time.perf_counter
+        resume, value = generator.send, None
+        while True:
+            start = perf_counter()
+            try:
+                event = resume(value)
+            except StopIteration as stop:
+                add(name if phase is None else f"{name}.{phase()}", perf_counter() - start)
+                return stop.value
+            add(name if phase is None else f"{name}.{phase()}", perf_counter() - start)
+            try:
+                value = yield event
+                resume = generator.send
+            except BaseException as error:
+                # failed events and interrupts go to the wrapped process
+                resume, value = generator.throw, error
+
+    def laps(self, prefix):
+        """Return lap(name): record the time since the previous lap as prefix.name"""
+        add = self.add
+        perf_counter = time.perf_counter
+        last = perf_counter()
+
+        def lap(name):
+            nonlocal last
+            now = perf_counter()
+            add(f"{prefix}.{name}", now - last)
+            last = now
+        return lap
+
+    def run(self, env, until=None):
+        """env.run(until), counting the events processed and the wall time"""
+        step = env.step
+
+        def counted_step():
+            self.events += 1
+            step()
+
+        env.step = counted_step
+        start = time.perf_counter()
+        try:
+            return env.run(until=until)
+        finally:
+            self.wall += time.perf_counter() - start
+            del env.step
+
+    def report(self):
+        """Per-run summary as a dict"""
+        timers = {}
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            seconds = self.times[name]
+            calls = self.counts[name]
+            timers[name] = {
+                'calls': calls,
+                'seconds': seconds,
+                'share': seconds / self.wall if self.wall > 0 else 0.0,
+                'mean_us': seconds / calls * 1e6 if calls else 0.0,
+            }
+        return {
+            'wall': self.wall,
+            'events': self.events,
+            'events_per_sec': self.events / self.wall if self.wall > 0 else 0.0,
+            'timers': timers,
+            'counters': {name: n for name, n in sorted(self.counts.items()) if name not in self.times},
+            'peaks': dict(sorted(self.peaks.items())),
+        }
+
+
+def format_report(report):
+    """Human readable multi-line profile"""
+    if report['events']:
+        lines = [f"{report['events']} events in {report['wall']:.3f}s ({report['events_per_sec']:,.0f} events/s)"]
+    else:
+        lines = [f"{report['wall']:.3f}s profiled"]
+    if report['timers']:
+        lines.append(f"  {'timer':<36}{'calls':>10}{'seconds':>10}{'share':>8}{'mean us':>10}")
+        for name, timer in report['timers'].items():
+            lines.append(f"  {name:<36}{timer['calls']:>10}{timer['seconds']:>10.3f}"
+                         f"{timer['share']:>8.1%}{timer['mean_us']:>10.2f}")
+    for name, n in report['counters'].items():
+        lines.append(f"  {name}: {n}")
+    if report['peaks']:
+        lines.append("  peaks: " + ", ".join(f"{name} {value}" for name, value in report['peaks'].items()))
+    return "\n".join(lines)
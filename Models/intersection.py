@@ -1,104 +1,257 @@
+from collections import deque
+
 import simpy
 
+from Models.controllers import RoundRobinController
+from Models.event_log import EventLog, DEBUG, INFO
+from Models.movements import approach_signals, turn
+from Models.vehicle_queue import VehicleQueue
+
 class Intersection:
-    def __init__(self, env):
+    def __init__(self, env, wake_on_arrival=True, log=None, metrics=None, controller=None, start=True,
+                 profiler=None, lanes=1, left_lanes=0, saturation_flow=None, recorder=None):
+        # start=False leaves the lights unlocked and the controller stopped,
+        # for checkpoint.restore to rebuild them
         self.env = env
 
-        self.traffic_lights = {
-            'N' : simpy.Resource(env, capacity=1),
-            'S' : simpy.Resource(env, capacity=1),
-            'E' : simpy.Resource(env, capacity=1),
-            'W' : simpy.Resource(env, capacity=1)
-        }
+        # signal -> lanes it controls, see movements.approach_signals; by
+        # default one signal and one lane per approach, both named after it
+        self.signals = approach_signals(lanes, left_lanes)
+        # any protected left signal besides the four approach signals
+        self.protected_left = len(self.signals) > 4
+        # optional vehicles per time unit a lane discharges while green; it
+        # replaces the crossing time of every vehicle queued
+        self.saturation_flow = saturation_flow
+
+        # signal controller run as the one scheduler process, the original
+        # round robin with priority preemption by default
+        self.controller = controller if controller is not None else RoundRobinController()
+        unserved = [signal for signal in self.signals if signal not in self.controller.served_signals(self.signals)]
+        if unserved:
+            raise ValueError(f"{type(self.controller).__name__} never gives green to signal(s) {', '.join(unserved)}, "
+                             f"whose vehicles would wait forever")
+
+        # structured event log, disabled unless a sink is given
+        self.log = log if log is not None else EventLog()
+        # optional MetricsCollector fed with arrivals, waits and departures
+        self.metrics = metrics
+        # optional recorder.TrajectoryRecorder taking a record per departure
+        self.recorder = recorder
+        # optional instrumentation.Profiler timing the hot paths
+        self.profiler = profiler
+        if profiler is not None:
+            self._instrument(profiler)
+
+        # one light per lane, locked by a red request while its signal is red;
+        # with a strict red the red request may overtake waiting vehicles
+        light = simpy.PriorityResource if self.controller.strict_red else simpy.Resource
+        self.traffic_lights = {lane: light(env, capacity=1) for lanes in self.signals.values() for lane in lanes}
+        self.lane_names = {light: lane for lane, light in self.traffic_lights.items()}
 
         #round-robin queues for each direction
         self.queues = {
-            'N': [],
-            'S': [],
-            'E': [],
-            'W': []
+            'N': VehicleQueue(),
+            'S': VehicleQueue(),
+            'E': VehicleQueue(),
+            'W': VehicleQueue()
         }
+        # running sum of vehicle.prio per queue, kept up to date by
+        # request_crossing/remove_from_queue so preemption checks are O(directions)
+        self.queue_prio = {
+            'N': 0,
+            'S': 0,
+            'E': 0,
+            'W': 0
+        }
+        # vehicles queued or crossing, and vehicles arrived so far, per signal
+        self.demand = dict.fromkeys(self.signals, 0)
+        self.arrived = dict.fromkeys(self.signals, 0)
         self.time_quantum = 5
 
+        # when every queue is empty the scheduler sleeps on this event
+        # (triggered by request_crossing) instead of polling once per tick
+        self.wake_on_arrival = wake_on_arrival
+        self.arrival_event = env.event()
+
+        # lightweight vehicles admitted via admit() wait here for their lane's
+        # service loop, which is started on the first admission
+        self.pending = {}
+        self.lane_wakeup = {}
+        self.lane_processes = {}
+
         # Start with all lights red (locked)
         self.red_lights = {}
-        for direction in ['N', 'S', 'E', 'W']:
-            self.red_lights[direction] = self.traffic_lights[direction].request()
+        self.light_states = dict.fromkeys(self.signals, 'red')
+        if start:
+            for lane in self.traffic_lights:
+                self.red_lights[lane] = self.traffic_lights[lane].request()
+
+        # callbacks(time, signal, state) run on every light change
+        self.light_listeners = []
 
-        self.scheduler_process = env.process(self.scheduler())
+        # progress of the controller, if it keeps any (RoundRobinState)
+        self.controller_state = None
+        self.scheduler_process = env.process(self.scheduler()) if start else None
 
     def request_crossing(self, vehicle):
         #Add vehicle to queue and return resource request
         self.queues[vehicle.source].append(vehicle)
-        request = self.traffic_lights[vehicle.source].request()
+        self.queue_prio[vehicle.source] += vehicle.prio
+        signal = self.signal_of(vehicle)
+        self.demand[signal] += 1
+        self.arrived[signal] += 1
+        if self.saturation_flow is not None:
+            vehicle.crossing_time = 1 / self.saturation_flow
+        if self.metrics is not None:
+            self.metrics.record_arrival(self.env.now, vehicle.source)
+
+        # wake up an idle scheduler; trigger it before the light request so
+        # the scheduler runs ahead of the grant, as its polling tick would
+        if not self.arrival_event.triggered:
+            self.arrival_event.succeed()
+
+        lanes = self.signals[signal]
+        if len(lanes) == 1:
+            light = self.traffic_lights[lanes[0]]
+        else:
+            # join the lane with the fewest vehicles crossing or waiting
+            light = min((self.traffic_lights[lane] for lane in lanes),
+                        key=lambda candidate: len(candidate.users) + len(candidate.queue))
+        request = light.request()
         return request
 
-    def remove_from_queue(self, vehicle):
-        #Remove vehicle from queue when it has completed crossing
-        if vehicle in self.queues[vehicle.source]:
-            self.queues[vehicle.source].remove(vehicle)
-            print(f"Time {self.env.now:.1f}: Vehicle {vehicle.id} removed from {vehicle.source} queue")
+    def signal_of(self, vehicle):
+        # left turns wait for the protected left signal where there is one
+        if self.protected_left and turn(vehicle.source, vehicle.destination) == 'left':
+            left = vehicle.source + 'L'
+            if left in self.signals:
+                return left
+        return vehicle.source
 
-    #controls traffic lights red and green
-    def scheduler(self):
-        directions = ['N', 'S', 'E', 'W']
-        current_direction_index = 0
+    def admit(self, vehicle):
+        # Queue a LightVehicle. Instead of running a process per car, the
+        # lane's service loop drives it once its light request is granted.
+        vehicle.wait_start_time = self.env.now
+        if self.log.enabled(INFO):
+            self.log.emit(INFO, self.env.now, 'arrive', vehicle=vehicle.id, source=vehicle.source,
+                          destination=vehicle.destination, prio=vehicle.prio, arrival_time=vehicle.arrival_time)
+        vehicle.request = self.request_crossing(vehicle)
+
+        lane = self.lane_names[vehicle.request.resource]
+        if lane not in self.pending:
+            self.pending[lane] = deque()
+            self.lane_wakeup[lane] = self.env.event()
+            process = self.serve_lane(lane)
+            if self.profiler is not None:
+                process = self.profiler.process('intersection.serve_lane', process)
+            self.lane_processes[lane] = self.env.process(process)
+
+        self.pending[lane].append(vehicle)
+        if not self.lane_wakeup[lane].triggered:
+            self.lane_wakeup[lane].succeed()
+
+    def serve_lane(self, lane, vehicle=None, crossed=None):
+        # service loop for admitted vehicles: take the head of the lane, wait
+        # for green, cross and leave, mirroring Vehicle.run. A restored lane
+        # starts with the vehicle that is crossing and its crossing timeout.
+        pending = self.pending[lane]
+        light = self.traffic_lights[lane]
+        log = self.log
 
         while True:
-            # check if any vehicle is waiting in the current direction
-            current_direction = directions[current_direction_index]
+            if vehicle is not None:
+                yield crossed
 
-            if not self.queues[current_direction]:
-                # if no vehicle is waiting, move to the next direction
-                current_direction_index = (current_direction_index + 1) % 4
-                yield self.env.timeout(1)
+                vehicle.status = "done"
+                self.remove_from_queue(vehicle)
+                if log.enabled(INFO):
+                    log.emit(INFO, self.env.now, 'cross_end', vehicle=vehicle.id)
+                light.release(vehicle.request)
+                vehicle.request = None
+                vehicle = None
+
+            if not pending:
+                self.lane_wakeup[lane] = self.env.event()
+                yield self.lane_wakeup[lane]
                 continue
 
-            # turn current direction green
-            self.traffic_lights[current_direction].release(self.red_lights[current_direction])
-            print(f'Time {self.env.now:.1f}: Direction : {current_direction} turns green')
+            vehicle = pending.popleft()
+            yield vehicle.request
 
-            time = 1
+            vehicle.wait_end_time = self.env.now
+            vehicle.wt = vehicle.wait_end_time - vehicle.wait_start_time
+            vehicle.status = "crossing"
+            if self.metrics is not None:
+                self.metrics.record_wait(self.env.now, vehicle.source, vehicle.wt)
+            if log.enabled(INFO):
+                log.emit(INFO, self.env.now, 'cross_start', vehicle=vehicle.id, source=vehicle.source,
+                         destination=vehicle.destination)
 
-            while(time <= self.time_quantum):
-                #run for 1 unit of time
-                yield self.env.timeout(1)
-                time += 1
+            crossed = self.env.timeout(vehicle.crossing_time)
 
-                # Skip if no vehicle is waiting
-                if not self.queues[current_direction]:
-                    self.red_lights[current_direction] = self.traffic_lights[current_direction].request()
-                    yield self.red_lights[current_direction]
-                    print(f'Time {self.env.now:.1f}: Direction : {current_direction} turns red')
-                    break
+    def remove_from_queue(self, vehicle):
+        #Remove vehicle from queue when it has completed crossing
+        if vehicle in self.queues[vehicle.source]:
+            self.queues[vehicle.source].remove(vehicle)
+            self.queue_prio[vehicle.source] -= vehicle.prio
+            self.demand[self.signal_of(vehicle)] -= 1
+            if self.metrics is not None:
+                self.metrics.record_departure(self.env.now, vehicle.source)
+            if self.recorder is not None:
+                self.recorder.record(vehicle, self.env.now)
+            if self.log.enabled(DEBUG):
+                self.log.emit(DEBUG, self.env.now, 'dequeue', vehicle=vehicle.id, source=vehicle.source)
 
-                #check for priority preemption
+    #controls traffic lights red and green
+    def scheduler(self):
+        if self.profiler is not None:
+            return self.profiler.process('controller', self.controller.run(self))
+        return self.controller.run(self)
+
+    def _instrument(self, profiler):
+        # shadow the hot methods with timed wrappers on this instance only, so
+        # intersections without a profiler run the plain methods
+        self.check_prio_queue = profiler.timed('intersection.check_prio_queue', self.check_prio_queue)
+        self.remove_from_queue = profiler.timed('intersection.remove_from_queue', self.remove_from_queue)
+        request_crossing = profiler.timed('intersection.request_crossing', self.request_crossing)
 
-                #check current direction priority
-                current_prio = 0
-                for vehicle in self.queues[current_direction]:
-                    current_prio += vehicle.prio
+        def counted_request_crossing(vehicle):
+            request = request_crossing(vehicle)
+            profiler.peak('queue.' + vehicle.source, len(self.queues[vehicle.source]))
+            return request
+        self.request_crossing = counted_request_crossing
 
-                priority_dir_index = self.check_prio_queue(current_prio,  current_direction)
+    def add_light_listener(self, callback):
+        """Call callback(time, signal, state) whenever a signal turns green or red"""
+        self.light_listeners.append(callback)
 
-                if priority_dir_index is not None:
-                    #set current light to red
-                    self.red_lights[current_direction] = self.traffic_lights[current_direction].request()
-                    yield self.red_lights[current_direction]
-                    print(f'Time {self.env.now:.1f}: Direction : {current_direction} turns red')
+    def set_green(self, signal):
+        # let the vehicles queued on this signal's lanes through
+        for lane in self.signals[signal]:
+            self.traffic_lights[lane].release(self.red_lights[lane])
+        self._light_changed(signal, 'green')
 
-                    current_direction_index = priority_dir_index
-                    break
+    def set_red(self, signal):
+        # Generator: request the lights back and wait until they are granted,
+        # which is when the signal actually turns red
+        yield self.request_red(signal)
+        self.red_granted(signal)
 
-            #turn current direction red
-            if current_direction not in self.red_lights:
-                self.red_lights[current_direction] = self.traffic_lights[current_direction].request()
-                yield self.red_lights[current_direction]
-                print(f'Time {self.env.now:.1f}: Direction : {current_direction} turns red')
+    def request_red(self, signal):
+        # the red request (of every lane), to be yielded and followed by red_granted
+        lanes = self.signals[signal]
+        for lane in lanes:
+            if self.controller.strict_red:
+                request = self.traffic_lights[lane].request(priority=-1)
+            else:
+                request = self.traffic_lights[lane].request()
+            self.red_lights[lane] = request
+        if len(lanes) == 1:
+            return request
+        return self.env.all_of([self.red_lights[lane] for lane in lanes])
 
-            # rotate to next signal
-            if priority_dir_index is None:
-                current_direction_index = (current_direction_index + 1) % 4
+    def red_granted(self, signal):
+        self._light_changed(signal, 'red')
 
     def check_prio_queue(self, max_prio, current_direction):
         directions = ['N', 'S', 'E', 'W']
@@ -110,19 +263,28 @@ class Intersection:
             if not self.queues[direction]:
                 continue
 
-            p = 0
-            for vehicle in self.queues[direction]:
-                p += vehicle.prio
+            p = self.queue_prio[direction]
             if p > max_prio:
                 max_prio = p
                 max_dir_index = i
 
         if max_dir_index is not None:
-            dir_name = directions[max_dir_index]
-            print(f'Time {self.env.now:.1f}: Priority detected in direction {dir_name} with value {max_prio}')
+            if self.log.enabled(INFO):
+                self.log.emit(INFO, self.env.now, 'preempt', direction=directions[max_dir_index], value=max_prio)
         return max_dir_index
 
-    def run(self, duration=100):
+    def _light_changed(self, signal, state):
+        self.light_states[signal] = state
+        if self.log.enabled(INFO):
+            self.log.emit(INFO, self.env.now, 'light', direction=signal, state=state)
+        for callback in self.light_listeners:
+            callback(self.env.now, signal, state)
+
+    def run(self, duration=100, monitor=None):
+        # with a steady_state.SteadyStateMonitor, duration is only the
+        # horizon and the monitor's report is returned
         print(f"Running simulation for {duration} time units")
+        if monitor is not None:
+            return monitor.run(duration)
         return self.env.run(until=duration)
 
@@ -0,0 +1,42 @@
+class LightVehicle:
+    """
+    Passive vehicle record for large runs.
+
+    Unlike Vehicle it does not start a SimPy process of its own. It is handed
+    to Intersection.admit when it arrives, and the intersection's per-lane
+    service loop moves it through waiting, crossing and done. __slots__ keeps
+    each instance small.
+    """
+
+    __slots__ = ('id', 'arrival_time', 'source', 'destination', 'prio', 'crossing_time',
+                 'wait_start_time', 'wait_end_time', 'wt', 'status', 'request')
+
+    def __init__(self, id, at, source, destination, prio=0):
+        self.id = id
+        self.arrival_time = at
+        self.source = source
+        self.destination = destination
+        self.prio = prio  # higher number = higher priority
+        self.crossing_time = 1
+
+        # Timing statistics
+        self.wait_start_time = None
+        self.wait_end_time = None
+
+        #state of the vehicle
+        self.wt = 0
+        self.status = "waiting"  # waiting, crossing, done
+
+        # pending traffic light request while queued
+        self.request = None
+
+    def __str__(self):
+        return f"Vehicle {self.id}: {self.source}->{self.destination} Status {self.status}, Arrival Time {self.arrival_time}, Wait Time {self.wt}, Priority {self.prio}"
+
+
+def scheduled_arrivals(env, intersection, vehicles):
+    """Generator process admitting LightVehicles at their arrival times"""
+    for vehicle in sorted(vehicles, key=lambda v: v.arrival_time):
+        if env.now < vehicle.arrival_time:
+            yield env.timeout(vehicle.arrival_time - env.now)
+        intersection.admit(vehicle)
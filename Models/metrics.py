@@ -0,0 +1,284 @@
+"""
+Streaming metrics for the simulation.
+
+Intersection, Vehicle and Network report arrivals, waits and departures to a
+MetricsCollector as they happen, so statistics no longer require keeping
+every vehicle alive. All state is O(directions + quantiles): wait times go
+through Welford's running mean/variance and P-square quantile estimators
+(exact over the first thousand waits), queue lengths through time-weighted
+averages. The collector can take
+periodic snapshots, of which only the last `keep` are retained.
+confidence_interval gives t-based 95% intervals for replication results.
+"""
+import bisect
+import math
+import statistics
+from collections import deque
+
+# two-sided 95% Student t quantiles by degrees of freedom
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+        9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120,
+        17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064,
+        25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042, 40: 2.021, 60: 2.000,
+        120: 1.980}
+
+
+class RunningStats:
+    """Welford's online mean and variance, plus min and max"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    @property
+    def variance(self):
+        # sample variance, nan until there are two values
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+
+class P2Quantile:
+    """
+    P-square estimate of the p-quantile (Jain & Chlamtac, 1985). Keeps five
+    markers whose heights are adjusted with a piecewise-parabolic fit as
+    values stream in, instead of storing the values.
+
+    The first `exact` values are kept sorted and give the exact quantile;
+    once there are more, the markers start at their desired positions in
+    that sorted sample, so short runs are exact and long ones start from a
+    well-placed estimate rather than from five values.
+    """
+
+    def __init__(self, p, exact=1000):
+        self.p = p
+        self.exact = max(exact, 5)
+        self.count = 0
+        self.heights = []  # the sorted values, then the marker heights
+        self.positions = None
+        self.desired = None
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        self.count += 1
+        q = self.heights
+        if self.positions is None:
+            bisect.insort(q, x)
+            if self.count > self.exact:
+                self._place_markers()
+            return
+
+        # cell k with q[k] <= x < q[k + 1], stretching the outer markers
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # move the middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _place_markers(self):
+        # markers at the ranks closest to their desired positions, kept
+        # strictly increasing
+        values = self.heights
+        last = len(values) - 1
+        self.desired = [1 + last * increment for increment in self.increments]
+        n = [round(desired) for desired in self.desired]
+        for i in range(1, 5):
+            n[i] = max(n[i], n[i - 1] + 1)
+        for i in range(3, -1, -1):
+            n[i] = min(n[i], n[i + 1] - 1)
+        self.positions = n
+        self.heights = [values[rank - 1] for rank in n]
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    @property
+    def value(self):
+        if self.count == 0:
+            return math.nan
+        if self.positions is not None:
+            return self.heights[2]
+        # exact (interpolated) quantile of the values seen so far
+        position = self.p * (self.count - 1)
+        lower = int(position)
+        upper = min(lower + 1, self.count - 1)
+        return self.heights[lower] + (position - lower) * (self.heights[upper] - self.heights[lower])
+
+
+class TimeWeighted:
+    """Time average of a piecewise-constant value such as a queue length"""
+
+    def __init__(self, start_time=0.0, value=0):
+        self.start_time = start_time
+        self.last_time = start_time
+        self.value = value
+        self.area = 0.0
+
+    def update(self, time, value):
+        self.area += self.value * (time - self.last_time)
+        self.last_time = time
+        self.value = value
+
+    def mean(self, time):
+        elapsed = time - self.start_time
+        if elapsed <= 0:
+            return float(self.value)
+        return (self.area + self.value * (time - self.last_time)) / elapsed
+
+
+class _DirectionStats:
+    def __init__(self, start_time):
+        self.arrived = 0
+        self.departed = 0
+        self.wait = RunningStats()
+        self.queue = TimeWeighted(start_time)
+
+
+class MetricsCollector:
+    def __init__(self, quantiles=(0.5, 0.9, 0.99), keep=100, on_snapshot=None, start_time=0.0):
+        """
+        Args:
+            quantiles: wait time quantiles to estimate
+            keep: number of most recent snapshots retained in `snapshots`
+            on_snapshot: optional callback receiving every snapshot dict
+            start_time: simulation time the time averages start from
+        """
+        self.start_time = start_time
+        self.wait = RunningStats()
+        self.wait_quantiles = {p: P2Quantile(p) for p in quantiles}
+        self.directions = {}
+        self.snapshots = deque(maxlen=keep)
+        self.on_snapshot = on_snapshot
+
+    def _direction(self, direction):
+        stats = self.directions.get(direction)
+        if stats is None:
+            stats = self.directions[direction] = _DirectionStats(self.start_time)
+        return stats
+
+    def record_arrival(self, time, direction):
+        # a vehicle joined the queue of `direction`
+        stats = self._direction(direction)
+        stats.arrived += 1
+        stats.queue.update(time, stats.queue.value + 1)
+
+    def record_wait(self, time, direction, wait):
+        # a vehicle got green after waiting `wait` time units
+        self.wait.add(wait)
+        for estimator in self.wait_quantiles.values():
+            estimator.add(wait)
+        self._direction(direction).wait.add(wait)
+
+    def record_departure(self, time, direction):
+        # a vehicle finished crossing and left the queue of `direction`
+        stats = self._direction(direction)
+        stats.departed += 1
+        stats.queue.update(time, stats.queue.value - 1)
+
+    def snapshot(self, time):
+        """Return the current statistics as a dict, and record it as a snapshot"""
+        elapsed = time - self.start_time
+        directions = {}
+        for direction, stats in sorted(self.directions.items()):
+            directions[direction] = {
+                'arrived': stats.arrived,
+                'departed': stats.departed,
+                'throughput': stats.departed / elapsed if elapsed > 0 else 0.0,
+                'mean_wait': stats.wait.mean,
+                'queue_length': stats.queue.value,
+                'mean_queue_length': stats.queue.mean(time),
+            }
+
+        departed = sum(d['departed'] for d in directions.values())
+        snapshot = {
+            'time': time,
+            'arrived': sum(d['arrived'] for d in directions.values()),
+            'served': self.wait.count,
+            'departed': departed,
+            'throughput': departed / elapsed if elapsed > 0 else 0.0,
+            'mean_wait': self.wait.mean,
+            'stdev_wait': self.wait.stdev,
+            'max_wait': self.wait.max if self.wait.count else 0.0,
+            'wait_quantiles': {p: q.value for p, q in self.wait_quantiles.items()},
+            'directions': directions,
+        }
+        self.snapshots.append(snapshot)
+        if self.on_snapshot is not None:
+            self.on_snapshot(snapshot)
+        return snapshot
+
+    def snapshot_process(self, env, interval):
+        """Generator process taking a snapshot every `interval` time units"""
+        while True:
+            yield env.timeout(interval)
+            self.snapshot(env.now)
+
+
+def format_snapshot(snapshot):
+    """Human readable multi-line summary of a snapshot"""
+    quantiles = ", ".join(f"p{p * 100:g} {v:.2f}" for p, v in snapshot['wait_quantiles'].items())
+    lines = [
+        f"Time {snapshot['time']:.1f}: {snapshot['arrived']} arrived, {snapshot['departed']} crossed, "
+        f"throughput {snapshot['throughput']:.3f}/unit",
+        f"Wait: mean {snapshot['mean_wait']:.2f}, stdev {snapshot['stdev_wait']:.2f}, "
+        f"max {snapshot['max_wait']:.2f} ({quantiles})",
+    ]
+    for direction, stats in snapshot['directions'].items():
+        lines.append(f"  {direction}: {stats['departed']} crossed, mean wait {stats['mean_wait']:.2f}, "
+                     f"mean queue {stats['mean_queue_length']:.2f}")
+    return "\n".join(lines)
+
+
+def t_quantile(dof):
+    # degrees of freedom between two table entries take the smaller one,
+    # whose larger quantile keeps the interval conservative
+    if dof <= 0:
+        return math.nan
+    return T_95[max(limit for limit in T_95 if limit <= dof)]
+
+
+def confidence_interval(values):
+    """Return (mean, half width of the 95% confidence interval)"""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, math.nan
+    half_width = t_quantile(len(values) - 1) * statistics.stdev(values) / math.sqrt(len(values))
+    return mean, half_width
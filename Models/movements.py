@@ -0,0 +1,53 @@
+"""
+Turning movements and the signals and lanes of an intersection's approaches.
+
+Vehicles drive on the right. A vehicle coming from `source` and leaving
+towards `destination` turns left, goes through or turns right, which is
+derived from the two sides in clockwise order.
+
+Every approach has a signal named after it ('N', ...) for its through and
+right-turning traffic, served by one or more lanes. An approach with
+dedicated left-turn lanes also has a protected left signal ('NL', ...).
+Lanes are named after their signal, with a number from the second lane on:
+'N', 'N2', 'NL', 'NL2'.
+"""
+DIRECTIONS = ['N', 'S', 'E', 'W']
+CLOCKWISE = ['N', 'E', 'S', 'W']
+TURNS = {1: 'left', 2: 'through', 3: 'right'}
+
+
+def turn(source, destination):
+    """'left', 'through' or 'right' for a vehicle from source to destination"""
+    if source not in CLOCKWISE or destination not in CLOCKWISE or source == destination:
+        raise ValueError(f"no turning movement from {source!r} to {destination!r}")
+    return TURNS[(CLOCKWISE.index(destination) - CLOCKWISE.index(source)) % 4]
+
+
+def approach_signals(lanes=1, left_lanes=0):
+    """
+    Return {signal: [lane names]} for the four approaches.
+
+    Args:
+        lanes: lanes for through and right-turning traffic, an int for every
+            approach or a dict per approach
+        left_lanes: dedicated left-turn lanes with a protected signal, an int
+            or a dict per approach; 0 lets left turns share the through lanes
+    """
+    def per_approach(value, direction, minimum):
+        count = value.get(direction, minimum) if isinstance(value, dict) else value
+        if count < minimum:
+            raise ValueError(f"approach {direction} needs at least {minimum} lane(s), got {count}")
+        return count
+
+    signals = {}
+    for direction in DIRECTIONS:
+        signals[direction] = _lane_names(direction, per_approach(lanes, direction, 1))
+    for direction in DIRECTIONS:
+        count = per_approach(left_lanes, direction, 0)
+        if count:
+            signals[direction + 'L'] = _lane_names(direction + 'L', count)
+    return signals
+
+
+def _lane_names(signal, count):
+    return [signal] + [f"{signal}{i}" for i in range(2, count + 1)]
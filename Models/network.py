@@ -0,0 +1,298 @@
+"""
+Road network of many intersections sharing one SimPy environment.
+
+Intersections are connected by directed links with a travel time and a
+capacity (vehicles on the link at once). Routes are looked up in a next-hop
+table built once with Dijkstra from every node, so a vehicle only does a
+dict lookup per intersection instead of searching.
+
+A vehicle entering a link is scheduled to arrive at the link's end
+travel_time later, while its slot on the link stays taken until then.
+Vehicles arriving at an intersection at the same instant, and trips
+scheduled to start then, join their queues in vehicle id order ahead of
+every other event at that instant, so the order does not depend on when
+the arrival was scheduled or on which environment it came from (see
+partitioned).
+"""
+import heapq
+
+import simpy
+from simpy.events import URGENT
+
+from Models.event_log import INFO
+from Models.intersection import Intersection
+
+# a vehicle leaving through the E side enters the next intersection from its W side
+OPPOSITE = {'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E'}
+
+
+class Link:
+    def __init__(self, env, start, exit_dir, end, travel_time, capacity):
+        self.start = start
+        self.exit_dir = exit_dir
+        self.end = end
+        self.entry_dir = OPPOSITE[exit_dir]
+        self.travel_time = travel_time
+        self.capacity = capacity
+        self.slots = simpy.Resource(env, capacity=capacity)
+
+
+class NetworkVehicle:
+    """Vehicle travelling through several intersections along a precomputed route"""
+
+    __slots__ = ('id', 'prio', 'origin', 'entry_dir', 'target', 'exit_dir', 'crossing_time',
+                 'node', 'source', 'destination', 'status', 'wait_start_time', 'wait_end_time',
+                 'wt', 'total_wait', 'hops', 'start_time', 'end_time')
+
+    def __init__(self, id, origin, entry_dir, target, exit_dir, prio=0):
+        self.id = id
+        self.prio = prio
+        self.origin = origin
+        self.entry_dir = entry_dir
+        self.target = target
+        self.exit_dir = exit_dir
+        self.crossing_time = 1
+
+        # current intersection and the approach/exit used there; source and
+        # destination are what Intersection reads
+        self.node = origin
+        self.source = entry_dir
+        self.destination = None
+
+        self.status = "waiting"  # waiting, crossing, travelling, done
+        self.wait_start_time = None
+        self.wait_end_time = None
+        self.wt = 0  # wait at the current intersection
+        self.total_wait = 0
+        self.hops = 0
+        self.start_time = None
+        self.end_time = None
+
+
+def grid_spec(rows, cols, travel_time=10, capacity=10):
+    """Spec of a rows x cols grid with two-way links; nodes are named (row, col)"""
+    nodes = [(r, c) for r in range(rows) for c in range(cols)]
+    links = []
+    for r in range(rows):
+        for c in range(cols):
+            if c + 1 < cols:
+                links.append(((r, c), 'E', (r, c + 1), travel_time, capacity))
+                links.append(((r, c + 1), 'W', (r, c), travel_time, capacity))
+            if r + 1 < rows:
+                links.append(((r, c), 'S', (r + 1, c), travel_time, capacity))
+                links.append(((r + 1, c), 'N', (r, c), travel_time, capacity))
+    return {'nodes': nodes, 'links': links}
+
+
+def shortest_routes(nodes, links):
+    """
+    Dijkstra from every node over `links` (anything with start, exit_dir, end
+    and travel_time). Returns (next_hop, distance) where next_hop[a][b] is the
+    side to leave `a` through to reach `b` fastest.
+    """
+    outgoing = {name: [] for name in nodes}
+    for link in links:
+        outgoing[link.start].append(link)
+
+    next_hop = {}
+    distance = {}
+    for source in outgoing:
+        dist = {source: 0}
+        first_exit = {}
+        heap = [(0, 0, source)]
+        counter = 1  # tie breaker so node names never get compared
+        while heap:
+            d, _, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for link in outgoing[node]:
+                nd = d + link.travel_time
+                if nd < dist.get(link.end, float('inf')):
+                    dist[link.end] = nd
+                    first_exit[link.end] = link.exit_dir if node == source else first_exit[node]
+                    heapq.heappush(heap, (nd, counter, link.end))
+                    counter += 1
+        next_hop[source] = first_exit
+        distance[source] = dist
+    return next_hop, distance
+
+
+class Network:
+    def __init__(self, env, log=None):
+        self.env = env
+        self.log = log
+        self.intersections = {}
+        self.links = {}  # (node, exit_dir) -> Link
+
+        # next_hop[node][target] -> exit_dir, built by build_routes()
+        self.next_hop = {}
+        self.distance = {}
+        self._routes_dirty = True
+
+        self.completed = 0
+        self.total_wait = 0
+
+        # heap of (time, vehicle id, vehicle) scheduled arrivals, and the
+        # times an event is scheduled to start them at
+        self.arrivals = []
+        self.arrival_times = set()
+
+        # optional callback(vehicle, link, arrival_time) taking over vehicles
+        # entering a link instead of scheduling their arrival locally, used
+        # to hand vehicles to another partition
+        self.handoff = None
+        # optional callback(vehicle) for finished trips
+        self.on_complete = None
+
+    def add_intersection(self, name, **kwargs):
+        if self.log is not None:
+            kwargs.setdefault('log', self.log)
+        intersection = Intersection(self.env, **kwargs)
+        self.intersections[name] = intersection
+        self._routes_dirty = True
+        return intersection
+
+    def connect(self, start, exit_dir, end, travel_time, capacity=10):
+        """Add a one-way link leaving `start` through `exit_dir` and entering `end`"""
+        if (start, exit_dir) in self.links:
+            raise ValueError(f"{start} already has a link leaving through {exit_dir}")
+        link = Link(self.env, start, exit_dir, end, travel_time, capacity)
+        self.links[(start, exit_dir)] = link
+        self._routes_dirty = True
+        return link
+
+    def connect_both(self, a, exit_dir, b, travel_time, capacity=10):
+        self.connect(a, exit_dir, b, travel_time, capacity)
+        self.connect(b, OPPOSITE[exit_dir], a, travel_time, capacity)
+
+    @classmethod
+    def from_spec(cls, env, spec, nodes=None, log=None, **intersection_kwargs):
+        """
+        Build a network from a spec dict ({'nodes': [...], 'links': [(start,
+        exit_dir, end, travel_time, capacity), ...]}). With `nodes` only those
+        intersections and the links leaving them are created.
+        """
+        network = cls(env, log=log)
+        for name in spec['nodes']:
+            if nodes is None or name in nodes:
+                network.add_intersection(name, **intersection_kwargs)
+        for start, exit_dir, end, travel_time, capacity in spec['links']:
+            if nodes is None or start in nodes:
+                network.connect(start, exit_dir, end, travel_time, capacity)
+        return network
+
+    @classmethod
+    def grid(cls, env, rows, cols, travel_time=10, capacity=10, log=None, **intersection_kwargs):
+        """Build a rows x cols grid with two-way links; nodes are named (row, col)"""
+        network = cls.from_spec(env, grid_spec(rows, cols, travel_time, capacity), log=log, **intersection_kwargs)
+        network.build_routes()
+        return network
+
+    def build_routes(self):
+        """Precompute shortest-path next hops (by free-flow travel time) between all nodes"""
+        self.next_hop, self.distance = shortest_routes(self.intersections, self.links.values())
+        self._routes_dirty = False
+
+    def set_routes(self, next_hop):
+        """Use a next-hop table computed elsewhere, e.g. for the whole network of a partition"""
+        self.next_hop = next_hop
+        self._routes_dirty = False
+
+    def boundary_sides(self):
+        """(node, side) pairs with no link attached, where trips can enter or leave"""
+        sides = []
+        for name in self.intersections:
+            for side in ('N', 'S', 'E', 'W'):
+                if (name, side) not in self.links:
+                    sides.append((name, side))
+        return sides
+
+    def route_exit(self, node, target, exit_dir):
+        # exit to take at `node` for a vehicle heading for `target`
+        if node == target:
+            return exit_dir
+        try:
+            return self.next_hop[node][target]
+        except KeyError:
+            raise ValueError(f"no route from {node} to {target}") from None
+
+    def add_vehicle(self, vehicle):
+        """Start the trip of a NetworkVehicle at the current simulation time"""
+        if self._routes_dirty:
+            self.build_routes()
+        return self.env.process(self.trip(vehicle))
+
+    def schedule_arrival(self, vehicle, time):
+        """
+        Continue the trip of `vehicle` at vehicle.node at `time`, not before
+        now; a vehicle without a start time starts its trip there
+        """
+        heapq.heappush(self.arrivals, (time, vehicle.id, vehicle))
+        if time not in self.arrival_times:
+            self.arrival_times.add(time)
+            # an urgent event runs ahead of the normal ones at its time
+            event = simpy.Event(self.env)
+            event.callbacks.append(lambda _: self._start_arrivals(time))
+            event._ok = True
+            event._value = None
+            self.env.schedule(event, URGENT, time - self.env.now)
+
+    def _start_arrivals(self, time):
+        self.arrival_times.discard(time)
+        while self.arrivals and self.arrivals[0][0] <= time:
+            _, _, vehicle = heapq.heappop(self.arrivals)
+            self.env.process(self.trip(vehicle))
+
+    def trip(self, vehicle):
+        # cross vehicle.node, then leave the network or enter the next link
+        env = self.env
+        if vehicle.start_time is None:
+            vehicle.start_time = env.now
+
+        intersection = self.intersections[vehicle.node]
+        vehicle.destination = self.route_exit(vehicle.node, vehicle.target, vehicle.exit_dir)
+        vehicle.status = "waiting"
+        vehicle.wait_start_time = env.now
+
+        with intersection.request_crossing(vehicle) as request:
+            yield request
+
+            vehicle.wait_end_time = env.now
+            vehicle.wt = vehicle.wait_end_time - vehicle.wait_start_time
+            vehicle.total_wait += vehicle.wt
+            vehicle.status = "crossing"
+            if intersection.metrics is not None:
+                intersection.metrics.record_wait(env.now, vehicle.source, vehicle.wt)
+            yield env.timeout(vehicle.crossing_time)
+            intersection.remove_from_queue(vehicle)
+
+        vehicle.hops += 1
+        link = self.links.get((vehicle.node, vehicle.destination))
+        if link is None:
+            self._complete(vehicle)
+            return
+
+        # once the link has room the vehicle is on its way to the next
+        # intersection, and holds its slot until it gets there
+        vehicle.status = "travelling"
+        with link.slots.request() as slot:
+            yield slot
+            arrival = env.now + link.travel_time
+            vehicle.node = link.end
+            vehicle.source = link.entry_dir
+            if self.handoff is not None:
+                self.handoff(vehicle, link, arrival)
+            else:
+                self.schedule_arrival(vehicle, arrival)
+            yield env.timeout(link.travel_time)
+
+    def _complete(self, vehicle):
+        env = self.env
+        vehicle.status = "done"
+        vehicle.end_time = env.now
+        self.completed += 1
+        self.total_wait += vehicle.total_wait
+        if self.on_complete is not None:
+            self.on_complete(vehicle)
+        if self.log is not None and self.log.enabled(INFO):
+            self.log.emit(INFO, env.now, 'trip_end', vehicle=vehicle.id, value=vehicle.end_time - vehicle.start_time)
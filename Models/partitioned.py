@@ -0,0 +1,229 @@
+"""
+Conservative parallel simulation of a road network split across processes.
+
+Intersections are partitioned over workers, each with its own
+simpy.Environment holding its intersections and the links leaving them.
+Time advances in windows of length `lookahead`, the minimum link travel
+time. A vehicle entering a link during a window arrives at the link's end
+at least one lookahead later, so no earlier than the end of the window, and
+it is sent to the partition owning that end in the batch exchanged then.
+
+Every link arrival goes through that exchange, even inside one partition,
+and is scheduled with Network.schedule_arrival, which starts the vehicles
+arriving at one instant in id order ahead of everything else then. This
+makes the event order seen by each intersection independent of how the
+network is split, so any number of partitions gives exactly the results of
+run_network, the same trips on one plain Network in one environment.
+"""
+import heapq
+import math
+import multiprocessing
+import random
+
+import simpy
+
+from Models.network import Network, NetworkVehicle, shortest_routes
+
+
+class _LinkRecord:
+    __slots__ = ('start', 'exit_dir', 'end', 'travel_time')
+
+    def __init__(self, start, exit_dir, end, travel_time):
+        self.start = start
+        self.exit_dir = exit_dir
+        self.end = end
+        self.travel_time = travel_time
+
+
+def spec_routes(spec):
+    links = [_LinkRecord(start, exit_dir, end, travel_time)
+             for start, exit_dir, end, travel_time, _ in spec['links']]
+    next_hop, _ = shortest_routes(spec['nodes'], links)
+    return next_hop
+
+
+def generate_trips(spec, rate, duration, seed, prio_share=0.2):
+    """
+    Pre-generate Poisson trips between boundary sides of the network so every
+    partitioning replays the same demand. Returns a list of
+    (time, id, origin, entry_dir, target, exit_dir, prio) tuples.
+    """
+    rng = random.Random(seed)
+    linked = {(start, exit_dir) for start, exit_dir, _, _, _ in spec['links']}
+    boundary = [(name, side) for name in spec['nodes'] for side in ('N', 'S', 'E', 'W')
+                if (name, side) not in linked]
+
+    trips = []
+    vehicle_id = 1
+    t = rng.expovariate(rate)
+    while t < duration:
+        origin, entry_dir = rng.choice(boundary)
+        target, exit_dir = rng.choice(boundary)
+        while (target, exit_dir) == (origin, entry_dir):
+            target, exit_dir = rng.choice(boundary)
+        prio = 1 if rng.random() < prio_share else 0
+        trips.append((t, vehicle_id, origin, entry_dir, target, exit_dir, prio))
+        vehicle_id += 1
+        t += rng.expovariate(rate)
+    return trips
+
+
+def partition_nodes(nodes, parts):
+    """Split nodes into `parts` contiguous blocks of the sorted node order (row strips for grids)"""
+    nodes = sorted(nodes)
+    size = math.ceil(len(nodes) / parts)
+    return [nodes[i:i + size] for i in range(0, len(nodes), size)]
+
+
+def _pack(vehicle):
+    return (vehicle.id, vehicle.prio, vehicle.origin, vehicle.entry_dir, vehicle.target, vehicle.exit_dir,
+            vehicle.node, vehicle.source, vehicle.total_wait, vehicle.hops, vehicle.start_time)
+
+
+def _finished(vehicle):
+    return vehicle.id, vehicle.start_time, vehicle.end_time, vehicle.total_wait, vehicle.hops
+
+
+def _unpack(state):
+    (vehicle_id, prio, origin, entry_dir, target, exit_dir,
+     node, source, total_wait, hops, start_time) = state
+    vehicle = NetworkVehicle(vehicle_id, origin, entry_dir, target, exit_dir, prio=prio)
+    vehicle.node = node
+    vehicle.source = source
+    vehicle.total_wait = total_wait
+    vehicle.hops = hops
+    vehicle.start_time = start_time
+    return vehicle
+
+
+class Partition:
+    """One worker's share of the network, advanced window by window"""
+
+    def __init__(self, spec, nodes, routes, trips, intersection_kwargs=None):
+        self.env = simpy.Environment()
+        self.network = Network.from_spec(self.env, spec, nodes=set(nodes), **(intersection_kwargs or {}))
+        self.network.set_routes(routes)
+        self.network.handoff = self._handoff
+        self.network.on_complete = self._complete
+
+        self.pending = []  # heap of (arrival time, vehicle id, packed vehicle)
+        self.outbox = []
+        self.finished = []
+        for t, vehicle_id, origin, entry_dir, target, exit_dir, prio in trips:
+            vehicle = NetworkVehicle(vehicle_id, origin, entry_dir, target, exit_dir, prio=prio)
+            self.pending.append((t, vehicle_id, _pack(vehicle)))
+        heapq.heapify(self.pending)
+
+    def _handoff(self, vehicle, link, time):
+        self.outbox.append((time, vehicle.id, _pack(vehicle)))
+
+    def _complete(self, vehicle):
+        self.finished.append(_finished(vehicle))
+
+    def advance(self, window_end, inbound):
+        """Receive arrivals, simulate up to window_end and return the vehicles handed off meanwhile"""
+        for message in inbound:
+            heapq.heappush(self.pending, message)
+        while self.pending and self.pending[0][0] < window_end:
+            time, _, state = heapq.heappop(self.pending)
+            self.network.schedule_arrival(_unpack(state), time)
+
+        self.env.run(until=window_end)
+        outbound, self.outbox = self.outbox, []
+        return outbound
+
+
+def _worker_main(conn, args):
+    partition = Partition(*args)
+    while True:
+        message = conn.recv()
+        if message is None:
+            conn.send(partition.finished)
+            conn.close()
+            return
+        window_end, inbound = message
+        conn.send(partition.advance(window_end, inbound))
+
+
+def run_network(spec, trips, duration, intersection_kwargs=None):
+    """
+    Simulate `trips` on the whole network `spec` in one environment, the
+    reference the partitioned runs reproduce. Returns finished trips like
+    run_partitioned.
+    """
+    env = simpy.Environment()
+    network = Network.from_spec(env, spec, **(intersection_kwargs or {}))
+    network.set_routes(spec_routes(spec))
+    finished = []
+    network.on_complete = lambda vehicle: finished.append(_finished(vehicle))
+    for t, vehicle_id, origin, entry_dir, target, exit_dir, prio in trips:
+        network.schedule_arrival(NetworkVehicle(vehicle_id, origin, entry_dir, target, exit_dir, prio=prio), t)
+    env.run(until=duration)
+    return sorted(finished)
+
+
+def run_partitioned(spec, trips, duration, parts=1, processes=True, intersection_kwargs=None):
+    """
+    Simulate `trips` on the network `spec` until `duration` split into `parts`
+    partitions. With processes=False all partitions run in this process.
+
+    Returns finished trips as (id, start, end, total_wait, hops) tuples sorted by id.
+    """
+    lookahead = min(travel_time for _, _, _, travel_time, _ in spec['links'])
+    if lookahead <= 0:
+        raise ValueError("partitioned runs need a positive minimum link travel time")
+
+    routes = spec_routes(spec)
+    blocks = partition_nodes(spec['nodes'], parts)
+    owner = {node: i for i, block in enumerate(blocks) for node in block}
+    trips_by_part = [[] for _ in blocks]
+    for trip in trips:
+        trips_by_part[owner[trip[2]]].append(trip)
+
+    args = [(spec, block, routes, trips_by_part[i], intersection_kwargs) for i, block in enumerate(blocks)]
+
+    if processes and len(blocks) > 1:
+        context = multiprocessing.get_context()
+        conns, workers = [], []
+        for worker_args in args:
+            parent, child = context.Pipe()
+            worker = context.Process(target=_worker_main, args=(child, worker_args), daemon=True)
+            worker.start()
+            conns.append(parent)
+            workers.append(worker)
+
+        def exchange(window_end, inboxes):
+            for conn, inbound in zip(conns, inboxes):
+                conn.send((window_end, inbound))
+            return [conn.recv() for conn in conns]
+
+        def collect():
+            for conn in conns:
+                conn.send(None)
+            finished = [row for conn in conns for row in conn.recv()]
+            for worker in workers:
+                worker.join()
+            return finished
+    else:
+        partitions = [Partition(*worker_args) for worker_args in args]
+
+        def exchange(window_end, inboxes):
+            return [p.advance(window_end, inbound) for p, inbound in zip(partitions, inboxes)]
+
+        def collect():
+            return [row for p in partitions for row in p.finished]
+
+    inboxes = [[] for _ in blocks]
+    window_end = 0
+    while window_end < duration:
+        window_end = min(window_end + lookahead, duration)
+        outbound = exchange(window_end, inboxes)
+
+        # route handed-off vehicles to the partition owning their next intersection
+        inboxes = [[] for _ in blocks]
+        for batch in outbound:
+            for message in batch:
+                _, _, state = message
+                inboxes[owner[state[6]]].append(message)  # state[6] is vehicle.node
+
+    return sorted(collect())
@@ -0,0 +1,126 @@
+"""
+Per-vehicle trajectory records in fixed-width columns.
+
+An Intersection given a TrajectoryRecorder writes one record per vehicle
+when it leaves: id, source, destination, prio and the arrival, green and
+exit times. Records go into a preallocated NumPy buffer of RECORD_DTYPE;
+whenever chunk_size of them are buffered they are spilled to one raw file
+per column, each chunk through a memory map of the file's next region. So
+millions of vehicles can be recorded with bounded memory, and no vehicle
+has to be kept alive for its statistics.
+
+In a Network, where intersections share a recorder, a NetworkVehicle gets
+one record per intersection it crosses, arriving when it joined that
+intersection's queue.
+
+read_trajectories opens the columns of a finished recording as read-only
+memory maps without copying them. Directions are stored as indexes into
+DIRECTIONS, as in traces. Vehicles still queued at the end of a run are
+not recorded.
+"""
+import json
+import os
+
+import numpy as np
+
+from Models.traces import DIRECTIONS
+
+RECORD_DTYPE = np.dtype([('id', '<i8'), ('source', 'u1'), ('destination', 'u1'), ('prio', 'i1'),
+                         ('arrival', '<f8'), ('green', '<f8'), ('exit', '<f8')])
+META_FILE = 'trajectories.json'
+
+
+class TrajectoryRecorder:
+    """
+    Args:
+        path: directory the column files are written to, created if needed;
+            None keeps the records in memory
+        chunk_size: records buffered between two spills
+    """
+
+    def __init__(self, path=None, chunk_size=65536):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.buffer = np.empty(chunk_size, dtype=RECORD_DTYPE)
+        self.filled = 0  # records in the buffer
+        self.count = 0  # records spilled
+        self.chunks = []  # spilled chunks when recording in memory
+        self.closed = False
+        self._index = {direction: i for i, direction in enumerate(DIRECTIONS)}
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for name in RECORD_DTYPE.names:
+                # start every column empty
+                open(self._column_path(name), 'wb').close()
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def record(self, vehicle, time):
+        """Record `vehicle` leaving the intersection at `time`"""
+        index = self._index
+        # a NetworkVehicle has no arrival time of its own: use when it joined
+        # this intersection's queue
+        arrival = getattr(vehicle, 'arrival_time', None)
+        if arrival is None:
+            arrival = vehicle.wait_start_time
+        self.buffer[self.filled] = (vehicle.id, index[vehicle.source], index[vehicle.destination], vehicle.prio,
+                                    arrival, vehicle.wait_end_time, time)
+        self.filled += 1
+        if self.filled == self.chunk_size:
+            self._spill()
+
+    def _spill(self):
+        records = self.buffer[:self.filled]
+        if self.path is None:
+            self.chunks.append(records.copy())
+        else:
+            for name in RECORD_DTYPE.names:
+                column = records[name]
+                offset = self.count * column.itemsize
+                with open(self._column_path(name), 'r+b') as f:
+                    f.truncate(offset + column.nbytes)
+                mapped = np.memmap(self._column_path(name), dtype=column.dtype, mode='r+', offset=offset,
+                                   shape=column.shape)
+                mapped[:] = column
+                mapped.flush()
+                del mapped
+        self.count += self.filled
+        self.filled = 0
+
+    def __len__(self):
+        return self.count + self.filled
+
+    def close(self):
+        """Spill the remaining records and write the metadata; returns the record count"""
+        if not self.closed:
+            if self.filled:
+                self._spill()
+            if self.path is not None:
+                with open(os.path.join(self.path, META_FILE), 'w') as f:
+                    json.dump({'count': self.count, 'directions': DIRECTIONS,
+                               'columns': {name: RECORD_DTYPE[name].str for name in RECORD_DTYPE.names}}, f)
+            self.closed = True
+        return self.count
+
+    def columns(self):
+        """The records so far as a dict of column arrays"""
+        if self.path is not None:
+            self.close()
+            return read_trajectories(self.path)
+        records = np.concatenate(self.chunks + [self.buffer[:self.filled]])
+        return {name: records[name] for name in RECORD_DTYPE.names}
+
+
+def read_trajectories(path):
+    """Open a recording as a dict of read-only memory-mapped column arrays"""
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    columns = {}
+    for name, dtype in meta['columns'].items():
+        if meta['count'] == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(os.path.join(path, name + '.bin'), dtype=dtype, mode='r',
+                                      shape=(meta['count'],))
+    return columns
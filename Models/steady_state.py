@@ -0,0 +1,182 @@
+"""
+Steady-state detection and early termination of long runs.
+
+A SteadyStateMonitor samples an intersection's MetricsCollector every
+`interval` time units: the mean wait of the vehicles that got green in the
+interval, and the time-average queue length over it. Every `check_every`
+intervals, and no more often than every 10% of the run so far (a check
+costs O(observations)), it cuts off the warm-up with MSER-5 and estimates
+both steady-state means with batch means. The run stops as soon as both
+confidence intervals are within `precision` of their means, or as soon as
+the arrivals have ended and every queue is empty, instead of at the fixed
+horizon. The report tells how much simulated time that saved.
+
+MSER-5 (White, 1997) groups the observations in batches of five and drops
+the number of leading batches that minimises the standard error of the mean
+of the rest, looking at most at the first half of the run.
+"""
+import math
+
+from Models.metrics import confidence_interval
+
+
+def mser_truncation(values, batch_size=5):
+    """Number of leading values that MSER-batch_size drops as warm-up"""
+    batches = [sum(values[i:i + batch_size]) / batch_size
+               for i in range(0, len(values) - batch_size + 1, batch_size)]
+    n = len(batches)
+    if n < 2:
+        return 0
+
+    # suffix sums give every candidate's statistic in O(1)
+    total = squares = 0.0
+    suffix = []
+    for x in reversed(batches):
+        total += x
+        squares += x * x
+        suffix.append((total, squares))
+    suffix.reverse()
+
+    best, best_d = math.inf, 0
+    for d in range(n // 2 + 1):
+        total, squares = suffix[d]
+        m = n - d
+        statistic = (squares - total * total / m) / (m * m)
+        if statistic < best:
+            best, best_d = statistic, d
+    return best_d * batch_size
+
+
+def batch_means(values, batches=20):
+    """(mean, 95% half width) from `batches` non-overlapping batch means of values"""
+    size = len(values) // batches
+    if size == 0:
+        return math.nan, math.nan
+    return confidence_interval([sum(values[i * size:(i + 1) * size]) / size for i in range(batches)])
+
+
+class SteadyStateMonitor:
+    """
+    Args:
+        env: SimPy environment
+        intersection: Intersection with a MetricsCollector
+        arrivals: the arrival process, or a list of vehicle processes; once
+            none is alive and no vehicle is queued the run has drained
+        interval: time units per observation
+        precision: target half width of the 95% intervals, relative to the means
+        batches: number of batch means the intervals are computed from
+        check_every: least observations between two checks
+    """
+
+    def __init__(self, env, intersection, arrivals=None, interval=10.0, precision=0.05, batches=20,
+                 check_every=10):
+        if intersection.metrics is None:
+            raise ValueError("the steady-state monitor reads the intersection's MetricsCollector")
+        self.env = env
+        self.intersection = intersection
+        self.arrivals = arrivals if isinstance(arrivals, (list, tuple)) or arrivals is None else [arrivals]
+        self.interval = interval
+        self.precision = precision
+        self.batches = batches
+        self.check_every = check_every
+
+        self.waits = []  # per interval mean wait, None when nobody got green
+        self.queues = []  # per interval mean of the total queue length
+        self.estimate = None
+        self.report = None
+        self.done = env.event()
+        self.start_time = env.now
+        self.process = env.process(self._observe())
+
+    def _observe(self):
+        env = self.env
+        metrics = self.intersection.metrics
+        served, wait_total, queue_area = 0, 0.0, self._queue_area()
+        next_check = self.check_every
+
+        while True:
+            yield env.timeout(self.interval)
+
+            wait = metrics.wait
+            total = wait.mean * wait.count
+            self.waits.append((total - wait_total) / (wait.count - served) if wait.count > served else None)
+            served, wait_total = wait.count, total
+            area = self._queue_area()
+            self.queues.append((area - queue_area) / self.interval)
+            queue_area = area
+
+            if self.arrivals is not None and not any(p.is_alive for p in self.arrivals) \
+                    and not any(self.intersection.queues.values()):
+                self._stop('drained')
+                return
+            if len(self.queues) >= next_check:
+                next_check = max(len(self.queues) + self.check_every, int(len(self.queues) * 1.1))
+                self.estimate = self._estimate()
+                if self._precise(self.estimate):
+                    self._stop('precision')
+                    return
+
+    def _queue_area(self):
+        now = self.env.now
+        return sum(s.queue.area + s.queue.value * (now - s.queue.last_time)
+                   for s in self.intersection.metrics.directions.values())
+
+    def _estimate(self):
+        # the warm-up is the longer of the two series' MSER-5 truncations
+        served = [i for i, w in enumerate(self.waits) if w is not None]
+        cut = mser_truncation([self.waits[i] for i in served])
+        warmup = max(mser_truncation(self.queues), served[cut] if cut < len(served) else 0)
+        waits = [w for w in self.waits[warmup:] if w is not None]
+        mean_wait, wait_half_width = batch_means(waits, self.batches)
+        mean_queue, queue_half_width = batch_means(self.queues[warmup:], self.batches)
+        return {
+            'warmup': warmup * self.interval,
+            'mean_wait': mean_wait,
+            'wait_half_width': wait_half_width,
+            'mean_queue': mean_queue,
+            'queue_half_width': queue_half_width,
+        }
+
+    def _precise(self, estimate):
+        return all(estimate[half_width] <= self.precision * abs(estimate[mean])
+                   for mean, half_width in (('mean_wait', 'wait_half_width'), ('mean_queue', 'queue_half_width')))
+
+    def _stop(self, reason):
+        if self.estimate is None or reason != 'precision':
+            self.estimate = self._estimate()
+        self.report = dict(self.estimate, reason=reason, stopped_at=self.env.now)
+        if not self.done.triggered:
+            self.done.succeed()
+
+    def run(self, horizon):
+        """
+        Run until the estimates are precise, the run has drained or the
+        horizon is reached; return the report, which includes the simulated
+        time saved against the horizon
+        """
+        self.env.run(until=self.env.any_of([self.done, self.env.timeout(horizon - self.env.now)]))
+        return self.finish(horizon)
+
+    def finish(self, horizon):
+        """Complete and return the report of a run driven by someone else"""
+        if self.report is None:
+            self._stop('horizon')
+        self.report['horizon'] = horizon
+        self.report['saved'] = horizon - self.env.now
+        self.report['saved_share'] = self.report['saved'] / (horizon - self.start_time)
+        return self.report
+
+
+def format_report(report):
+    """Human readable summary of a SteadyStateMonitor report"""
+    lines = [
+        f"Stopped at time {report['stopped_at']:.1f} ({report['reason']}), horizon {report['horizon']:g}: "
+        f"saved {report['saved']:.1f} time units ({report['saved_share']:.0%})",
+        f"Warm-up truncated: {report['warmup']:.1f} time units",
+    ]
+    if math.isnan(report['wait_half_width']) or math.isnan(report['queue_half_width']):
+        lines.append("Steady state: too few observations after the warm-up for batch means")
+    else:
+        lines.append(f"Steady state: mean wait {report['mean_wait']:.3f} ± {report['wait_half_width']:.3f}, "
+                     f"mean queue {report['mean_queue']:.3f} ± {report['queue_half_width']:.3f}")
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+"""
+Arrival traces streamed from disk.
+
+A trace is a sequence of (time, source, destination, prio) records in
+non-decreasing time order, such as a detector log. Records are read lazily,
+either from a CSV file with a header row or from a .npy file of TRACE_DTYPE
+records opened as a memory map, and replayed by arrivals.trace_arrivals
+with a single generator process. Memory stays bounded by the vehicles in
+the system, not by the length of the trace.
+"""
+import csv
+import os
+
+import numpy as np
+
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+# binary record layout; directions are stored as indexes into DIRECTIONS
+TRACE_DTYPE = np.dtype([('time', '<f8'), ('source', 'u1'), ('destination', 'u1'), ('prio', 'i1')])
+CSV_FIELDS = ('time', 'source', 'destination', 'prio')
+
+
+def read_csv_trace(path):
+    """
+    Yield (time, source, destination, prio) records from a CSV file whose
+    header names at least the time, source and destination columns; prio
+    defaults to 0 when the column is missing. Other columns are ignored.
+    """
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        missing = [name for name in CSV_FIELDS[:3] if name not in header]
+        if missing:
+            raise ValueError(f"{path}: missing trace column(s) {', '.join(missing)}")
+        time_col, source_col, destination_col = (header.index(name) for name in CSV_FIELDS[:3])
+        prio_col = header.index('prio') if 'prio' in header else None
+
+        for row in reader:
+            if not row:
+                continue
+            prio = int(row[prio_col]) if prio_col is not None else 0
+            yield float(row[time_col]), row[source_col], row[destination_col], prio
+
+
+def read_npy_trace(path, chunk_size=65536):
+    """
+    Yield records from a .npy file of TRACE_DTYPE. The file is memory-mapped
+    and decoded chunk_size records at a time.
+    """
+    records = np.load(path, mmap_mode='r')
+    if records.dtype != TRACE_DTYPE:
+        raise ValueError(f"{path}: expected records of {TRACE_DTYPE}, got {records.dtype}")
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        for time, source, destination, prio in zip(chunk['time'].tolist(), chunk['source'].tolist(),
+                                                   chunk['destination'].tolist(), chunk['prio'].tolist()):
+            yield time, DIRECTIONS[source], DIRECTIONS[destination], prio
+
+
+def read_trace(path):
+    """Stream the records of a .csv or .npy trace, chosen by file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return read_csv_trace(path)
+    if extension == '.npy':
+        return read_npy_trace(path)
+    raise ValueError(f"{path}: unknown trace format, expected .csv or .npy")
+
+
+def write_csv_trace(path, records):
+    """Write (time, source, destination, prio) records to a CSV trace, consuming them lazily"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        writer.writerows(records)
+
+
+def csv_to_npy(csv_path, npy_path, chunk_size=65536):
+    """
+    Convert a CSV trace into a .npy trace without loading it: the rows are
+    counted first, then written chunk by chunk into a memory-mapped file.
+    Returns the number of records.
+    """
+    with open(csv_path, newline='') as f:
+        count = max(0, sum(1 for line in f if line.strip()) - 1)
+
+    out = np.lib.format.open_memmap(npy_path, mode='w+', dtype=TRACE_DTYPE, shape=(count,))
+    chunk = np.empty(chunk_size, dtype=TRACE_DTYPE)
+    index = {direction: i for i, direction in enumerate(DIRECTIONS)}
+    filled = written = 0
+    for time, source, destination, prio in read_csv_trace(csv_path):
+        chunk[filled] = (time, index[source], index[destination], prio)
+        filled += 1
+        if filled == chunk_size:
+            out[written:written + filled] = chunk
+            written += filled
+            filled = 0
+    out[written:written + filled] = chunk[:filled]
+    out.flush()
+    del out
+    return count
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from itertools import islice
+
+
+class VehicleQueue:
+    """
+    FIFO queue of vehicles waiting at one approach.
+
+    Backed by an insertion-ordered dict keyed on the vehicle object, so append,
+    popping the head and removing an arbitrary vehicle are all O(1). Reads
+    behave like the plain list it replaces (iteration, len, truthiness,
+    membership and indexing).
+    """
+
+    def __init__(self, vehicles=()):
+        self._items = OrderedDict()
+        for vehicle in vehicles:
+            self.append(vehicle)
+
+    def append(self, vehicle):
+        self._items[vehicle] = None
+
+    def remove(self, vehicle):
+        # same contract as list.remove
+        try:
+            del self._items[vehicle]
+        except KeyError:
+            raise ValueError(f"{vehicle!r} not in queue") from None
+
+    def discard(self, vehicle):
+        self._items.pop(vehicle, None)
+
+    def popleft(self):
+        if not self._items:
+            raise IndexError("pop from an empty queue")
+        vehicle, _ = self._items.popitem(last=False)
+        return vehicle
+
+    def head(self):
+        """Return the first vehicle in the queue without removing it, or None"""
+        return next(iter(self._items), None)
+
+    def __contains__(self, vehicle):
+        return vehicle in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError("queue index out of range")
+        if index == 0:
+            return self.head()
+        return next(islice(self._items, index, None))
+
+    def __repr__(self):
+        return f"VehicleQueue({list(self._items)!r})"
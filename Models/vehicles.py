@@ -1,3 +1,6 @@
+from Models.event_log import INFO
+
+
 class Vehicle:
 
     def __init__(self, env, id, at, source, destination, intersection, prio=0):
@@ -20,13 +23,20 @@ class Vehicle:
         self.wt = 0
         self.status = "waiting" # waiting, crossing, done
 
-        self.process = env.process(self.run())
+        run = self.run()
+        if intersection.profiler is not None:
+            # time every step of the vehicle under the status it ends in
+            run = intersection.profiler.process('vehicle.run', run, phase=lambda: self.status)
+        self.process = env.process(run)
 
     def run(self):
         if self.env.now < self.arrival_time:
                 yield self.env.timeout(self.arrival_time - self.env.now)
 
-        print(self)
+        log = self.intersection.log
+        if log.enabled(INFO):
+            log.emit(INFO, self.env.now, 'arrive', vehicle=self.id, source=self.source,
+                     destination=self.destination, prio=self.prio, arrival_time=self.arrival_time)
         self.wait_start_time = self.env.now
 
         with self.intersection.request_crossing(self) as request:
@@ -36,8 +46,12 @@ class Vehicle:
             self.wt = self.wait_end_time - self.wait_start_time
 
             self.status = "crossing"
-            print(
-                f"Time {self.env.now:.1f}: Vehicle {self.id} starts crossing from {self.source} to {self.destination}")
+            metrics = self.intersection.metrics
+            if metrics is not None:
+                metrics.record_wait(self.env.now, self.source, self.wt)
+            if log.enabled(INFO):
+                log.emit(INFO, self.env.now, 'cross_start', vehicle=self.id, source=self.source,
+                         destination=self.destination)
 
             # Cross the intersection
             yield self.env.timeout(self.crossing_time)
@@ -45,7 +59,8 @@ class Vehicle:
             # Completed crossing
             self.status = "done"
             self.intersection.remove_from_queue(self)
-            print(f"Time {self.env.now:.1f}: Vehicle {self.id} completed crossing")
+            if log.enabled(INFO):
+                log.emit(INFO, self.env.now, 'cross_end', vehicle=self.id)
 
     def __str__(self):
         """String representation of the vehicle for debugging and display."""
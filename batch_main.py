@@ -0,0 +1,91 @@
+import argparse
+import json
+import time
+
+from experiments.batch import Scenario, compare_controllers, run_batch
+from Models.controllers import CONTROLLERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded headless replications over an arrival-rate sweep")
+    parser.add_argument('--rates', type=float, nargs='+', default=[0.05, 0.1, 0.15, 0.2],
+                        help="arrival rates (vehicles per time unit) to sweep")
+    parser.add_argument('--seeds', type=int, default=30, help="number of seeded replications per rate")
+    parser.add_argument('--duration', type=float, default=3600, help="simulated time per replication")
+    parser.add_argument('--prio-share', type=float, default=0.2, help="share of priority vehicles")
+    parser.add_argument('--time-quantum', type=int, default=5, help="green time per direction")
+    parser.add_argument('--lightweight', action='store_true',
+                        help="use LightVehicles driven by the intersection instead of a process per car")
+    parser.add_argument('--controller', choices=sorted(CONTROLLERS), default='round_robin',
+                        help="signal controller (time quantum is its green time)")
+    parser.add_argument('--compare', nargs='+', choices=sorted(CONTROLLERS), metavar='CONTROLLER',
+                        help="run the same replications under these controllers and compare them seed by seed "
+                             "against the first one, instead of running --controller")
+    parser.add_argument('--lanes', type=int, default=1, help="through and right-turn lanes per approach")
+    parser.add_argument('--left-lanes', type=int, default=0,
+                        help="protected left-turn lanes per approach (needs a phased or max_pressure controller)")
+    parser.add_argument('--saturation-flow', type=float, default=None,
+                        help="vehicles per time unit discharged by a green lane (default: one per crossing time)")
+    parser.add_argument('--streams', action='store_true',
+                        help="draw arrivals from per-attribute NumPy streams (common random numbers)")
+    parser.add_argument('--antithetic', action='store_true',
+                        help="run every seed with its antithetic twin and average the pair (implies --streams)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--json', help="write summary and raw results to this file")
+    args = parser.parse_args()
+    controllers = args.compare or [args.controller]
+    if args.left_lanes and not set(controllers) <= {'phased', 'max_pressure'}:
+        parser.error("--left-lanes needs the phased or max_pressure controller, the others never serve "
+                     "left-turn signals")
+
+    scenario = Scenario(duration=args.duration, prio_share=args.prio_share, time_quantum=args.time_quantum,
+                        lightweight=args.lightweight, controller=args.controller, lanes=args.lanes,
+                        left_lanes=args.left_lanes, saturation_flow=args.saturation_flow,
+                        streams=args.streams or args.antithetic, antithetic=args.antithetic)
+
+    if args.compare:
+        compare(scenario, args)
+        return
+
+    start = time.perf_counter()
+    summary, results = run_batch(scenario, args.rates, args.seeds, workers=args.workers)
+    wall = time.perf_counter() - start
+
+    print(f"{'rate':>8}{'reps':>6}{'mean wait':>12}{'± 95% CI':>10}{'p90 wait':>10}{'p95 wait':>10}"
+          f"{'max wait':>12}{'throughput':>12}")
+    for row in summary:
+        print(f"{row['rate']:>8.3f}{row['replications']:>6}{row['mean_wait']:>12.3f}{row['mean_wait_ci']:>10.3f}"
+              f"{row['p90_wait']:>10.3f}{row['p95_wait']:>10.3f}{row['max_wait']:>12.3f}{row['throughput']:>12.4f}")
+    print(f"\n{len(results)} replications in {wall:.2f}s ({len(results) / wall:.1f} replications/s)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'scenario': vars(args), 'summary': summary, 'results': results}, f, indent=2)
+
+
+def compare(scenario, args):
+    start = time.perf_counter()
+    summary, results = compare_controllers(scenario, args.compare, args.rates, args.seeds, workers=args.workers)
+    wall = time.perf_counter() - start
+
+    reference = args.compare[0]
+    # widen the name and difference columns for long controller names
+    name = max(14, max(len(controller) for controller in args.compare) + 2)
+    diff = max(22, len(reference) + 5)
+    print(f"{'controller':<{name}}{'rate':>7}{'mean wait':>11}{'± CI':>8}{'vs ' + reference:>{diff}}"
+          f"{'p95 wait':>10}{'± CI':>8}{'vs ' + reference:>{diff}}{'throughput':>12}")
+    for row in summary:
+        print(f"{row['controller']:<{name}}{row['rate']:>7.3f}{row['mean_wait']:>11.3f}{row['mean_wait_ci']:>8.3f}"
+              f"{row['mean_wait_diff']:>+{diff - 8}.3f} ± {row['mean_wait_diff_ci']:<5.3f}"
+              f"{row['p95_wait']:>10.3f}{row['p95_wait_ci']:>8.3f}"
+              f"{row['p95_wait_diff']:>+{diff - 8}.3f} ± {row['p95_wait_diff_ci']:<5.3f}{row['throughput']:>12.4f}")
+    replications = sum(len(group) for group in results.values())
+    print(f"\n{replications} replications in {wall:.2f}s, differences paired by seed with 95% confidence intervals")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'scenario': vars(args), 'summary': summary, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Fork what-if branches from a checkpointed warm-up instead of re-simulating it.
+
+Simulates --warmup time units once, checkpoints the intersection and its
+arrivals, then runs one --horizon branch per time quantum in --quanta from
+the checkpoint. The same branches are also run the slow way, each from time
+0, to show the saving and that the results are identical.
+
+Usage:
+    python -m benchmarks.bench_checkpoint [--warmup 20000] [--horizon 2000] [--quanta 2 3 4 5 6 7 8]
+"""
+import argparse
+import random
+import time
+
+import simpy
+
+from Models.arrivals import PoissonArrivals
+from Models.checkpoint import checkpoint, restore
+from Models.intersection import Intersection
+from Models.metrics import MetricsCollector
+
+
+def warm_up(args):
+    env = simpy.Environment()
+    intersection = Intersection(env, metrics=MetricsCollector())
+    arrivals = PoissonArrivals(env, intersection, args.rate, random.Random(args.seed), lightweight=True)
+    arrivals.start()
+    env.run(until=args.warmup)
+    return env, intersection, arrivals
+
+
+def branch_result(env, intersection, args):
+    # the branch's statistics only: departures and the mean wait of the
+    # vehicles that got green during the branch
+    before = intersection.metrics.snapshot(env.now)
+    env.run(until=args.warmup + args.horizon)
+    after = intersection.metrics.snapshot(env.now)
+    served = after['served'] - before['served']
+    waited = after['mean_wait'] * after['served'] - before['mean_wait'] * before['served']
+    return after['departed'] - before['departed'], waited / served if served else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--warmup', type=float, default=20000)
+    parser.add_argument('--horizon', type=float, default=2000)
+    parser.add_argument('--quanta', type=int, nargs='+', default=[2, 3, 4, 5, 6, 7, 8])
+    parser.add_argument('--rate', type=float, default=0.4)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    env, intersection, arrivals = warm_up(args)
+    data = checkpoint(intersection, arrivals)
+    warmup_wall = time.perf_counter() - start
+    print(f"warm-up of {args.warmup:g} time units: {warmup_wall:.2f}s, checkpoint {len(data)} bytes")
+
+    forked = {}
+    start = time.perf_counter()
+    for quantum in args.quanta:
+        env, intersection, _ = restore(data)
+        intersection.time_quantum = quantum
+        forked[quantum] = branch_result(env, intersection, args)
+    fork_wall = time.perf_counter() - start
+
+    rerun = {}
+    start = time.perf_counter()
+    for quantum in args.quanta:
+        env, intersection, _ = warm_up(args)
+        intersection.time_quantum = quantum
+        rerun[quantum] = branch_result(env, intersection, args)
+    rerun_wall = time.perf_counter() - start
+
+    print(f"{'quantum':>8}{'departed':>10}{'mean wait':>12}")
+    for quantum in args.quanta:
+        departed, mean_wait = forked[quantum]
+        print(f"{quantum:>8}{departed:>10}{mean_wait:>12.3f}")
+    print(f"\n{len(args.quanta)} branches: {warmup_wall + fork_wall:.2f}s forked from the checkpoint, "
+          f"{rerun_wall:.2f}s re-simulating the warm-up each time "
+          f"({'identical' if forked == rerun else 'DIFFERENT'} results)")
+
+
+if __name__ == "__main__":
+    main()
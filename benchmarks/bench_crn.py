@@ -0,0 +1,84 @@
+"""
+Replications needed to compare two controllers, with and without variance reduction.
+
+Estimates the difference in mean wait between two controllers three ways:
+- independent: every controller gets its own seeds and random.Random arrivals
+- common random numbers: both see the same per-attribute arrival streams,
+  differences are taken seed by seed
+- common random numbers with antithetic pairs: as above, every seed averaged
+  with its antithetic twin (two runs per replication)
+and reports, from --seeds replications each, how many simulation runs every
+method needs for a 95% confidence interval of --half-width on the difference.
+
+The default rate keeps one lane per approach below saturation, about one
+vehicle per time unit with phases of one approach at a time; near it, the
+waits of a replication depend on how long its queues happen to grow more
+than on the arrivals both controllers share, and no method converges.
+Raise the rate together with --lanes and --left-lanes.
+
+Usage:
+    python -m benchmarks.bench_crn [--controllers phased max_pressure] [--rate 0.6] [--seeds 20]
+                                   [--lanes 1] [--left-lanes 0]
+"""
+import argparse
+import math
+import statistics
+import time
+from dataclasses import replace
+
+from experiments.batch import Scenario, compare_controllers, run_batch
+from Models.controllers import CONTROLLERS
+
+
+def runs_needed(stdev, half_width, runs_per_replication=1):
+    """Simulation runs per controller for a 95% interval of +- half_width"""
+    return math.ceil((1.96 * stdev / half_width) ** 2) * runs_per_replication
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--controllers', nargs=2, choices=sorted(CONTROLLERS), default=['phased', 'max_pressure'])
+    parser.add_argument('--rate', type=float, default=0.6)
+    parser.add_argument('--lanes', type=int, default=1, help="through and right-turn lanes per approach")
+    parser.add_argument('--left-lanes', type=int, default=0,
+                        help="protected left-turn lanes per approach (needs the phased or max_pressure controller)")
+    parser.add_argument('--duration', type=float, default=3600)
+    parser.add_argument('--seeds', type=int, default=20, help="replications per method and controller")
+    parser.add_argument('--half-width', type=float, default=0.05, help="target half width on the mean wait difference")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    if args.left_lanes and not set(args.controllers) <= {'phased', 'max_pressure'}:
+        parser.error("--left-lanes needs the phased or max_pressure controller, the others never serve "
+                     "left-turn signals")
+
+    first, second = args.controllers
+    scenario = Scenario(duration=args.duration, lightweight=True, lanes=args.lanes, left_lanes=args.left_lanes)
+    rows = []
+
+    start = time.perf_counter()
+    # independent: disjoint seeds, the variances of the two means add up
+    _, a = run_batch(replace(scenario, controller=first), [args.rate], range(args.seeds), workers=args.workers)
+    _, b = run_batch(replace(scenario, controller=second), [args.rate], range(args.seeds, 2 * args.seeds),
+                     workers=args.workers)
+    difference = statistics.fmean(r['mean_wait'] for r in b) - statistics.fmean(r['mean_wait'] for r in a)
+    stdev = math.hypot(statistics.stdev(r['mean_wait'] for r in a), statistics.stdev(r['mean_wait'] for r in b))
+    rows.append(('independent', difference, stdev, 1))
+
+    for name, antithetic in (('common random numbers', False), ('CRN + antithetic', True)):
+        crn = replace(scenario, streams=True, antithetic=antithetic)
+        _, results = compare_controllers(crn, args.controllers, [args.rate], args.seeds, workers=args.workers)
+        differences = [y['mean_wait'] - x['mean_wait'] for x, y in zip(results[first], results[second])]
+        rows.append((name, statistics.fmean(differences), statistics.stdev(differences), 2 if antithetic else 1))
+    wall = time.perf_counter() - start
+
+    print(f"mean wait of {second} minus {first} at rate {args.rate:g}, {args.lanes} lane(s) + {args.left_lanes} left, "
+          f"{args.seeds} replications per method")
+    print(f"{'method':<24}{'difference':>12}{'stdev':>10}{'runs needed':>14}")
+    for name, difference, stdev, runs_per_replication in rows:
+        print(f"{name:<24}{difference:>+12.3f}{stdev:>10.3f}"
+              f"{runs_needed(stdev, args.half_width, runs_per_replication):>14}")
+    print(f"\nruns needed per controller for a 95% interval of ±{args.half_width:g} ({wall:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the polling scheduler with the wake-on-arrival scheduler.
+
+Runs the same sparse (off-peak) and dense arrival traces through an
+Intersection in both modes and reports processed SimPy events, wall time and
+mean wait time (which should be identical in both modes).
+
+Usage:
+    python -m benchmarks.bench_idle_scheduler
+"""
+import random
+import time
+
+import simpy
+
+from Models.intersection import Intersection
+from Models.vehicles import Vehicle
+
+
+def make_trace(mean_gap, duration, seed=1):
+    """Return a list of (arrival_time, source, destination, prio) tuples"""
+    rng = random.Random(seed)
+    directions = ['N', 'S', 'E', 'W']
+    trace = []
+    t = rng.expovariate(1 / mean_gap)
+    while t < duration:
+        source = rng.choice(directions)
+        destination = rng.choice([d for d in directions if d != source])
+        prio = 1 if rng.random() < 0.2 else 0
+        trace.append((t, source, destination, prio))
+        t += rng.expovariate(1 / mean_gap)
+    return trace
+
+
+def run_trace(trace, duration, wake_on_arrival):
+    env = simpy.Environment()
+    intersection = Intersection(env, wake_on_arrival=wake_on_arrival)
+    vehicles = [
+        Vehicle(env=env, id=i, at=at, source=source, destination=destination,
+                intersection=intersection, prio=prio)
+        for i, (at, source, destination, prio) in enumerate(trace, start=1)
+    ]
+
+    events = 0
+    start = time.perf_counter()
+    while env.peek() < duration:
+        env.step()
+        events += 1
+    wall = time.perf_counter() - start
+
+    done = [v.wt for v in vehicles if v.status == "done"]
+    mean_wait = sum(done) / len(done) if done else 0.0
+    return events, wall, len(done), mean_wait
+
+
+def main():
+    scenarios = [
+        # name, mean inter-arrival gap, duration
+        ("sparse (24h off-peak)", 600.0, 86400),
+        ("dense", 2.0, 3600),
+    ]
+
+    print(f"{'scenario':<24}{'mode':<8}{'events':>10}{'wall (s)':>12}{'done':>8}{'mean wait':>12}")
+    for name, mean_gap, duration in scenarios:
+        trace = make_trace(mean_gap, duration)
+        for mode, wake in (("poll", False), ("wake", True)):
+            events, wall, done, mean_wait = run_trace(trace, duration, wake)
+            print(f"{name:<24}{mode:<8}{events:>10}{wall:>12.3f}{done:>8}{mean_wait:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Scaling benchmark for the partitioned network engine.
+
+Runs one grid scenario on a plain Network in a single environment, the
+reference, then partitioned in-process into one part and with 2..N worker
+processes. Reports wall time and speed-up against the reference, and checks
+every partitioned run returns exactly the same finished trips, arrival times
+included.
+
+Usage:
+    python -m benchmarks.bench_partitioned [--rows 12] [--cols 12] [--max-workers 8]
+"""
+import argparse
+import os
+import time
+
+from Models.network import grid_spec
+from Models.partitioned import generate_trips, run_network, run_partitioned
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=12)
+    parser.add_argument('--cols', type=int, default=12)
+    parser.add_argument('--rate', type=float, default=2.0, help="trips started per time unit")
+    parser.add_argument('--duration', type=float, default=3600)
+    parser.add_argument('--travel-time', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    spec = grid_spec(args.rows, args.cols, travel_time=args.travel_time, capacity=20)
+    trips = generate_trips(spec, args.rate, args.duration, args.seed)
+    print(f"{args.rows}x{args.cols} grid, {len(trips)} trips, lookahead {args.travel_time}")
+
+    start = time.perf_counter()
+    reference = run_network(spec, trips, args.duration)
+    base = time.perf_counter() - start
+    print(f"{'workers':>8}{'wall (s)':>10}{'speed-up':>10}{'finished':>10}  identical")
+    print(f"{'network':>8}{base:>10.2f}{1.0:>10.2f}{len(reference):>10}  reference")
+
+    failures = 0
+    for workers in range(1, args.max_workers + 1):
+        start = time.perf_counter()
+        result = run_partitioned(spec, trips, args.duration, parts=workers, processes=workers > 1)
+        wall = time.perf_counter() - start
+        identical = result == reference
+        failures += not identical
+        print(f"{workers:>8}{wall:>10.2f}{base / wall:>10.2f}{len(result):>10}  {identical}")
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
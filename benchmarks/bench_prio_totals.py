@@ -0,0 +1,114 @@
+"""
+Regression check for the running per-direction priority totals.
+
+Runs the same seeded workloads twice: once with Intersection.check_prio_queue
+reading the running totals in queue_prio, once with the original check that
+sums vehicle.prio over every queued vehicle on every call. Both runs log
+every event at DEBUG level; the check passes when the two event logs
+(preemptions, light changes, crossings) are identical and, at every check
+of the reference run, the running totals equal the sums. Reports the time
+spent in the checks both ways.
+
+Usage:
+    python -m benchmarks.bench_prio_totals [--seeds 20] [--duration 2000]
+"""
+import argparse
+import random
+import time
+
+import simpy
+
+from Models.arrivals import PoissonArrivals
+from Models.event_log import DEBUG, INFO, EventLog, RingBufferSink
+from Models.intersection import Intersection
+
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+
+def summed_check(intersection, counters):
+    # the original O(queued vehicles) check_prio_queue, which also compares
+    # the running totals with the sums it computes
+    def check_prio_queue(max_prio, current_direction):
+        start = time.perf_counter()
+        max_dir_index = None
+        for i, direction in enumerate(DIRECTIONS):
+            if direction == current_direction:
+                continue
+            if not intersection.queues[direction]:
+                continue
+
+            p = 0
+            for vehicle in intersection.queues[direction]:
+                p += vehicle.prio
+            if p != intersection.queue_prio[direction]:
+                counters['wrong_totals'] += 1
+            if p > max_prio:
+                max_prio = p
+                max_dir_index = i
+
+        if max_dir_index is not None and intersection.log.enabled(INFO):
+            intersection.log.emit(INFO, intersection.env.now, 'preempt', direction=DIRECTIONS[max_dir_index],
+                                  value=max_prio)
+        counters['seconds'] += time.perf_counter() - start
+        return max_dir_index
+    return check_prio_queue
+
+
+def timed_check(intersection, counters):
+    check_prio_queue = intersection.check_prio_queue
+
+    def timed(max_prio, current_direction):
+        start = time.perf_counter()
+        result = check_prio_queue(max_prio, current_direction)
+        counters['seconds'] += time.perf_counter() - start
+        return result
+    return timed
+
+
+def run(seed, rate, prio_share, duration, lightweight, check):
+    env = simpy.Environment()
+    sink = RingBufferSink(capacity=None)
+    intersection = Intersection(env, log=EventLog(sink, level=DEBUG))
+    counters = {'seconds': 0.0, 'wrong_totals': 0}
+    intersection.check_prio_queue = check(intersection, counters)
+    PoissonArrivals(env, intersection, rate, random.Random(seed), prio_share=prio_share,
+                    lightweight=lightweight).start()
+    env.run(until=duration)
+    return sink.records(), counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seeds', type=int, default=20, help="seeded workloads per rate and priority share")
+    parser.add_argument('--duration', type=float, default=2000)
+    parser.add_argument('--rates', type=float, nargs='+', default=[0.2, 0.8, 1.5])
+    parser.add_argument('--prio-shares', type=float, nargs='+', default=[0.2, 0.6])
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'rate':>6}{'prio':>6}{'runs':>6}{'identical':>11}{'preempts':>10}{'summed':>10}{'running':>10}")
+    for rate in args.rates:
+        for prio_share in args.prio_shares:
+            identical = preempts = 0
+            summed_seconds = running_seconds = 0.0
+            for seed in range(args.seeds):
+                lightweight = seed % 2 == 1
+                reference, summed = run(seed, rate, prio_share, args.duration, lightweight, summed_check)
+                records, running = run(seed, rate, prio_share, args.duration, lightweight, timed_check)
+                if records == reference and summed['wrong_totals'] == 0:
+                    identical += 1
+                preempts += sum(1 for record in records if record[2] == 'preempt')
+                summed_seconds += summed['seconds']
+                running_seconds += running['seconds']
+            failures += args.seeds - identical
+            print(f"{rate:>6g}{prio_share:>6g}{args.seeds:>6}{identical:>11}{preempts:>10}"
+                  f"{summed_seconds:>9.3f}s{running_seconds:>9.3f}s")
+
+    print(f"\nevent logs identical with running totals and summed priorities: "
+          f"{'yes' if failures == 0 else f'no, {failures} runs differ'}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
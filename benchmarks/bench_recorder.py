@@ -0,0 +1,71 @@
+"""
+Overhead and memory of recording every vehicle's trajectory.
+
+Runs --vehicles lightweight Poisson arrivals through one Intersection
+without a recorder, then with a TrajectoryRecorder spilling to a temporary
+directory, and reports the slow-down, the peak resident memory after each
+run and the recording's size. The recording is then read back through
+memory maps and its mean wait compared with the MetricsCollector's.
+
+Usage:
+    python -m benchmarks.bench_recorder [--vehicles 300000] [--rate 0.5]
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+import simpy
+
+from Models.arrivals import PoissonArrivals
+from Models.intersection import Intersection
+from Models.metrics import MetricsCollector
+from Models.recorder import TrajectoryRecorder, read_trajectories
+
+
+def run(args, recorder=None):
+    env = simpy.Environment()
+    metrics = MetricsCollector()
+    intersection = Intersection(env, metrics=metrics, recorder=recorder)
+    PoissonArrivals(env, intersection, args.rate, random.Random(args.seed), lightweight=True).start()
+    start = time.perf_counter()
+    env.run(until=args.vehicles / args.rate)
+    if recorder is not None:
+        recorder.close()
+    return metrics.snapshot(env.now), time.perf_counter() - start
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vehicles', type=int, default=300_000, help="expected number of arrivals")
+    parser.add_argument('--rate', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    summary, plain_wall = run(args)
+    print(f"without recorder: {summary['departed']} vehicles in {plain_wall:.2f}s, peak RSS {peak_rss_mb():.0f} MiB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = TrajectoryRecorder(directory)
+        summary, wall = run(args, recorder)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"with recorder:    {len(recorder)} records in {wall:.2f}s ({wall / plain_wall - 1:+.1%}), "
+              f"peak RSS {peak_rss_mb():.0f} MiB, {size / 2**20:.1f} MiB on disk "
+              f"({size / max(1, len(recorder)):.0f} bytes per vehicle)")
+
+        columns = read_trajectories(directory)
+        waits = columns['green'] - columns['arrival']
+        print(f"read back: mean wait {waits.mean():.4f} (collector {summary['mean_wait']:.4f} over "
+              f"{summary['served']} served), mean time in system {(columns['exit'] - columns['arrival']).mean():.4f}")
+        del columns, waits
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Frame-time benchmark for TrafficVisualizer.
+
+Renders frames headless (SDL dummy video driver) with a few hundred queued
+cars, moving one car through every queue per frame so labels keep changing,
+and reports the frame time distribution with the frame rate cap disabled.
+With --static nothing changes between frames, which measures the idle cost
+of the dirty-rectangle path; --full-redraw turns that path off. --profile
+breaks the frame time down into the steps of render().
+
+Usage (from the repository root, the sprites are loaded from assets/):
+    python -m benchmarks.bench_render [--cars 400] [--frames 600] [--static] [--full-redraw] [--profile]
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from Models.instrumentation import Profiler, format_report
+from Models.light_vehicles import LightVehicle
+from visualization.visual_components import TrafficVisualizer
+
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cars', type=int, default=400, help="queued cars, spread over the four approaches")
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--target-fps', type=float, default=60)
+    parser.add_argument('--static', action='store_true', help="keep the scene unchanged between frames")
+    parser.add_argument('--full-redraw', action='store_true', help="redraw and flip the whole screen every frame")
+    parser.add_argument('--profile', action='store_true', help="time the steps of every frame")
+    args = parser.parse_args()
+
+    visualizer = TrafficVisualizer()
+    visualizer.fps = 0
+    visualizer.partial_updates = not args.full_redraw
+    if args.profile:
+        visualizer.profiler = Profiler()
+
+    next_id = 0
+
+    def new_vehicle(source):
+        nonlocal next_id
+        next_id += 1
+        destination = DIRECTIONS[(DIRECTIONS.index(source) + 1 + next_id % 3) % 4]
+        return LightVehicle(next_id, 0, source, destination, prio=1 if next_id % 5 == 0 else 0)
+
+    queues = {d: [new_vehicle(d) for _ in range(args.cars // 4)] for d in DIRECTIONS}
+    visualizer.vehicle_queues = queues
+
+    frame_times = []
+    for frame in range(args.frames):
+        step = 0 if args.static else frame
+        green = DIRECTIONS[step // 30 % 4]
+        visualizer.light_states = {d: 'green' if d == green else 'red' for d in DIRECTIONS}
+        if not args.static:
+            for direction, queue in queues.items():
+                queue.pop(0)
+                queue.append(new_vehicle(direction))
+
+        start = time.perf_counter()
+        visualizer.render(step / 10)
+        frame_times.append(time.perf_counter() - start)
+
+    frame_times.sort()
+    mean = statistics.fmean(frame_times)
+    p95 = frame_times[int(0.95 * (len(frame_times) - 1))]
+    mode = 'static' if args.static else 'changing'
+    print(f"{args.cars} queued cars, {args.frames} frames, {mode} scene, "
+          f"{'full' if args.full_redraw else 'dirty-rectangle'} redraws")
+    print(f"frame time: mean {mean * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms, max {frame_times[-1] * 1000:.2f} ms")
+    print(f"throughput: {1 / mean:.0f} FPS (target {args.target_fps:g}: {'ok' if p95 < 1 / args.target_fps else 'MISSED'})")
+    if visualizer.profiler is not None:
+        visualizer.profiler.wall = sum(frame_times)
+        print(format_report(visualizer.profiler.report()))
+
+
+if __name__ == '__main__':
+    main()
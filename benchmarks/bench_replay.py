@@ -0,0 +1,153 @@
+"""
+Seek and playback cost of replaying a recorded run against re-simulating it.
+
+Simulates --duration time units of Poisson arrivals with every event logged
+as JSON lines, noting the true queues and lights at --checks random times.
+Then indexes the log into a ReplayLog and reports:
+- the index build time and its keyframes
+- random seeks: mean and worst latency, against re-simulating up to the
+  same time from the start
+- playback: the cost per frame of moving forward one frame's worth of
+  simulated time at several speeds
+and checks that every replayed frame at a check time shows the vehicles and
+lights the simulation had then. Finally it builds synthetic logs of
+--scaling deltas each and times playback frames near their start and near
+their end, which should cost the same however long the log is.
+
+Usage:
+    python -m benchmarks.bench_replay [--rate 1.0] [--duration 7200] [--keyframe-interval 30]
+                                      [--scaling 40000 400000 4000000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import simpy
+
+from Models.arrivals import PoissonArrivals
+from Models.event_log import DEBUG, EventLog, JsonlSink
+from Models.intersection import Intersection
+from visualization.replay import DIRECTIONS, ReplayCursor, ReplayLog
+
+
+def record(path, args, checks):
+    # simulate with every event logged, taking the true state at the check times
+    env = simpy.Environment()
+    log = EventLog(JsonlSink(path), level=DEBUG)
+    intersection = Intersection(env, log=log)
+    PoissonArrivals(env, intersection, args.rate, random.Random(args.seed), lightweight=True).start()
+    truth = []
+    start = time.perf_counter()
+    for t in checks:
+        env.run(until=t)
+        truth.append(({d: tuple(v.id for v in intersection.queues[d])[:args.visible] for d in DIRECTIONS},
+                      {d: intersection.light_states[d] for d in DIRECTIONS}))
+    env.run(until=args.duration)
+    wall = time.perf_counter() - start
+    log.close()
+    return truth, wall
+
+
+def synthetic_records(count):
+    # four vehicles per time unit, each queued for 2 time units, and a light
+    # change every 5: 2.05 deltas per vehicle, `count` in all
+    step = 0.25
+    vehicles = int(count / 2.05)
+    for i in range(vehicles):
+        time = i * step
+        if i % 20 == 0:
+            yield time, DEBUG, 'light', {'direction': DIRECTIONS[i // 20 % 4], 'state': 'green'}
+        if i >= 8:
+            yield time, DEBUG, 'dequeue', {'vehicle': i - 8}
+        yield time, DEBUG, 'arrive', {'vehicle': i, 'source': DIRECTIONS[i % 4], 'destination': 'N', 'prio': 0}
+
+
+def playback_frame_time(log, start, frames=300, speed=10, fps=30):
+    # mean cost of a playback frame over `frames` frames from `start`
+    cursor = ReplayCursor(log)
+    cursor.seek(start)
+    step = speed / fps
+    began = time.perf_counter()
+    for i in range(1, frames + 1):
+        cursor.seek(start + i * step)
+    return (time.perf_counter() - began) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rate', type=float, default=1.0, help="arrivals per time unit")
+    parser.add_argument('--duration', type=float, default=7200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keyframe-interval', type=float, default=30.0)
+    parser.add_argument('--checks', type=int, default=200, help="random times checked and seeked to")
+    parser.add_argument('--visible', type=int, default=16, help="vehicles per queue in a frame")
+    parser.add_argument('--scaling', type=int, nargs='*', default=[40000, 400000, 4000000],
+                        help="sizes in deltas of the synthetic logs playback is timed on")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    checks = sorted(rng.uniform(0, args.duration) for _ in range(args.checks))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'run.jsonl')
+        truth, simulate_wall = record(path, args, checks)
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        log = ReplayLog.from_jsonl(path, args.keyframe_interval)
+        index_wall = time.perf_counter() - start
+
+    # random seeks, checked against the simulation
+    cursor = ReplayCursor(log, args.visible)
+    order = list(range(len(checks)))
+    rng.shuffle(order)
+    latencies, mismatches = [], 0
+    for i in order:
+        start = time.perf_counter()
+        frame = cursor.seek(checks[i])
+        latencies.append(time.perf_counter() - start)
+        queues, lights = truth[i]
+        if ({d: tuple(v.id for v in frame.vehicle_queues[d]) for d in DIRECTIONS} != queues
+                or {d: frame.light_states[d] for d in DIRECTIONS} != lights):
+            mismatches += 1
+
+    print(f"recorded {args.duration:g} time units at rate {args.rate:g}: {len(log)} deltas, "
+          f"{size / 2 ** 20:.1f} MiB of JSON lines, simulated in {simulate_wall:.2f}s")
+    print(f"index: {index_wall:.2f}s, {len(log.keyframes)} keyframes every {args.keyframe_interval:g} time units")
+    resimulate = simulate_wall * statistics.fmean(checks) / args.duration
+    print(f"random seek: mean {statistics.fmean(latencies) * 1e6:.0f} us, max {max(latencies) * 1e6:.0f} us; "
+          f"re-simulating to the same times: mean {resimulate * 1e3:.0f} ms")
+    print(f"frames matching the simulation: {len(checks) - mismatches}/{len(checks)}")
+
+    print(f"\n{'playback at 30 fps':<20}{'per frame':>12}")
+    for speed in (1, 10, 100, 1000):
+        cursor = ReplayCursor(log, args.visible)
+        step = speed / 30
+        frames = int(args.duration / step)
+        start = time.perf_counter()
+        for i in range(frames):
+            cursor.seek(i * step)
+        wall = time.perf_counter() - start
+        print(f"{'x' + str(speed):<20}{wall / frames * 1e6:>9.1f} us")
+
+    if args.scaling:
+        print(f"\n{'synthetic log':<20}{'index':>10}{'frame near start':>18}{'frame near end':>16}")
+    for count in args.scaling:
+        start = time.perf_counter()
+        log = ReplayLog(synthetic_records(count), args.keyframe_interval)
+        index_wall = time.perf_counter() - start
+        near_start = playback_frame_time(log, 0.05 * log.end)
+        near_end = playback_frame_time(log, 0.95 * log.end)
+        print(f"{f'{len(log):,} deltas':<20}{index_wall:>9.2f}s{near_start * 1e6:>15.1f} us{near_end * 1e6:>13.1f} us")
+        del log
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Simulated time saved by stopping long runs at steady state.
+
+Runs Poisson arrivals at several rates with a SteadyStateMonitor, which
+truncates the warm-up with MSER-5 and stops once the mean wait and queue
+length are known to within --precision, and once more to the full --horizon.
+Reports where the monitored run stopped, the simulated and wall-clock time
+saved, and whether the full run's steady-state mean wait lies within the
+monitored run's confidence interval.
+
+Usage:
+    python -m benchmarks.bench_steady_state [--rates 0.2 0.6 1.0 1.3] [--horizon 100000] [--precision 0.05]
+"""
+import argparse
+import random
+import time
+
+import simpy
+
+from Models.arrivals import PoissonArrivals
+from Models.intersection import Intersection
+from Models.metrics import MetricsCollector
+from Models.steady_state import SteadyStateMonitor
+
+
+def run(rate, horizon, precision, seed):
+    env = simpy.Environment()
+    intersection = Intersection(env, metrics=MetricsCollector())
+    arrivals = PoissonArrivals(env, intersection, rate, random.Random(seed), lightweight=True)
+    monitor = SteadyStateMonitor(env, intersection, arrivals.start(), precision=precision)
+    start = time.perf_counter()
+    report = monitor.run(horizon)
+    return report, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rates', type=float, nargs='+', default=[0.2, 0.6, 1.0, 1.3])
+    parser.add_argument('--horizon', type=float, default=100000)
+    parser.add_argument('--precision', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'rate':>6}{'stopped':>10}{'reason':>11}{'warm-up':>9}{'mean wait':>18}{'full run':>10}"
+          f"{'saved':>7}{'wall':>15}")
+    flagged = False
+    for rate in args.rates:
+        report, wall = run(rate, args.horizon, args.precision, args.seed)
+        # precision 0 never stops early: the reference over the whole horizon
+        full, full_wall = run(rate, args.horizon, 0, args.seed)
+        covered = abs(full['mean_wait'] - report['mean_wait']) <= report['wait_half_width']
+        flagged = flagged or not covered
+        print(f"{rate:>6g}{report['stopped_at']:>10.0f}{report['reason']:>11}{report['warmup']:>9.0f}"
+              f"{report['mean_wait']:>10.3f} ± {report['wait_half_width']:<5.3f}"
+              f"{full['mean_wait']:>9.3f}{'' if covered else '*':1}{report['saved_share']:>6.0%}"
+              f"{wall:>7.2f}s/{full_wall:.2f}s")
+    if flagged:
+        print("\n* full-horizon mean wait outside the early stop's 95% interval")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Replay a large arrival trace streamed from CSV and from a memory-mapped .npy.
+
+Writes a synthetic Poisson trace of --records arrivals (lazily, it is never
+held in memory), converts it to .npy, and replays both files through one
+Intersection with LightVehicles created as they arrive. Reports replay rate
+and peak resident memory, which should stay flat as --records grows.
+
+Usage:
+    python -m benchmarks.bench_trace [--records 200000] [--rate 0.3]
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+import simpy
+
+from Models.arrivals import trace_arrivals
+from Models.intersection import Intersection
+from Models.metrics import MetricsCollector
+from Models.traces import csv_to_npy, read_trace, write_csv_trace
+
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+
+def synthetic_records(count, rate, seed=1):
+    rng = random.Random(seed)
+    t = 0.0
+    for _ in range(count):
+        t += rng.expovariate(rate)
+        source = rng.choice(DIRECTIONS)
+        destination = rng.choice([d for d in DIRECTIONS if d != source])
+        yield round(t, 3), source, destination, 1 if rng.random() < 0.2 else 0
+
+
+def replay(path):
+    env = simpy.Environment()
+    metrics = MetricsCollector()
+    intersection = Intersection(env, metrics=metrics)
+    env.process(trace_arrivals(env, intersection, read_trace(path), lightweight=True))
+
+    start = time.perf_counter()
+    env.run()
+    wall = time.perf_counter() - start
+    return metrics.snapshot(env.now), wall
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=200_000)
+    parser.add_argument('--rate', type=float, default=0.3, help="arrivals per time unit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'trace.csv')
+        npy_path = os.path.join(directory, 'trace.npy')
+
+        start = time.perf_counter()
+        write_csv_trace(csv_path, synthetic_records(args.records, args.rate))
+        csv_to_npy(csv_path, npy_path)
+        print(f"wrote {args.records} records in {time.perf_counter() - start:.1f}s "
+              f"(csv {os.path.getsize(csv_path) / 2**20:.1f} MiB, npy {os.path.getsize(npy_path) / 2**20:.1f} MiB), "
+              f"peak RSS {peak_rss_mb():.0f} MiB")
+
+        for path in (csv_path, npy_path):
+            summary, wall = replay(path)
+            print(f"{os.path.basename(path)}: {summary['arrived']} arrivals, {summary['served']} served, "
+                  f"mean wait {summary['mean_wait']:.3f} in {wall:.1f}s "
+                  f"({summary['arrived'] / wall:,.0f} arrivals/s), peak RSS {peak_rss_mb():.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Timing-plan sweep with the vectorized engine.
+
+Cross-validates Models.vectorized against the SimPy model on small random
+traces, then evaluates a grid of time_quantum x arrival rate plans in one
+lockstep run and reports the wall time and the best plan per rate.
+
+Usage:
+    python -m benchmarks.bench_vectorized [--plans 10000] [--duration 3600]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from Models.vectorized import DIRECTIONS, VectorIntersections, compare_with_simpy
+
+
+def random_traces(count, load, horizon, seed):
+    # integer arrival times from 2 on, `load` vehicles per time unit on average
+    traces = []
+    for c in range(count):
+        rng = random.Random(seed * 100003 + c)
+        trace = []
+        for t in range(2, horizon):
+            for _ in range(4):
+                if rng.random() < load / 4:
+                    trace.append((t, rng.choice(DIRECTIONS), 1 if rng.random() < 0.2 else 0))
+        traces.append(trace)
+    return traces
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--plans', type=int, default=10000)
+    parser.add_argument('--duration', type=int, default=3600)
+    parser.add_argument('--quanta', type=int, nargs=2, default=[2, 11], help="smallest and largest time_quantum")
+    parser.add_argument('--rates', type=float, nargs=2, default=[0.05, 0.35], help="lowest and highest arrival rate")
+    parser.add_argument('--validate', type=int, default=100, help="traces per load for the SimPy cross-check")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    for load in (0.1, 0.5, 0.9):
+        for quantum in (2, 5):
+            rows = compare_with_simpy(random_traces(args.validate, load, 100, args.seed), 1000, quantum)
+            exact = sum(1 for row in rows if row[0] == row[2] and row[1] == row[3])
+            print(f"load {load:.1f} quantum {quantum}: {exact}/{len(rows)} traces identical to SimPy")
+
+    quanta = np.arange(args.quanta[0], args.quanta[1] + 1)
+    per_rate = len(quanta)
+    rates = np.linspace(args.rates[0], args.rates[1], max(1, args.plans // per_rate))
+    engine = VectorIntersections(per_rate * len(rates), time_quantum=np.tile(quanta, len(rates)))
+
+    start = time.perf_counter()
+    engine.run(args.duration, rate=np.repeat(rates, per_rate), rng=np.random.default_rng(args.seed))
+    elapsed = time.perf_counter() - start
+    print(f"{engine.n} plans x {args.duration} time units in {elapsed:.2f}s")
+
+    waits = engine.mean_wait().reshape(len(rates), per_rate)
+    for i in np.linspace(0, len(rates) - 1, min(5, len(rates))).astype(int):
+        best = waits[i].argmin()
+        print(f"rate {rates[i]:.3f}: best time_quantum {quanta[best]} (mean wait {waits[i, best]:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Benchmark suite for the simulation and render hot paths, with JSON baselines.
+
+Every case runs in a fresh interpreter, so its peak RSS is its own:
+- saturation_*: headless Intersection with Poisson arrivals at increasing
+  rates, from light traffic to past saturation (queues grow without bound)
+- idle: sparse arrivals with long idle periods between them
+- preemption: half the vehicles are priority vehicles, near saturation
+- vehicles: thousands of queued Vehicles, each with its own process
+- render: headless TrafficVisualizer frames with a few hundred queued cars
+
+For each case the suite records the best wall time of --repeat runs, events
+per second (SimPy events, or frames for render), peak RSS and the peak of
+Python allocations traced by tracemalloc (in a separate run, tracing slows
+it down). --save writes the results as a baseline; --compare checks them
+against one and exits with status 1 when a case got slower or bigger than
+the thresholds allow. Baselines are only comparable on the same machine.
+
+Usage (from the repository root, the sprites are loaded from assets/):
+    python -m benchmarks.suite [--only saturation_1.0 render] [--repeat 3]
+                               [--save [benchmarks/baselines.json]] [--compare [benchmarks/baselines.json]]
+                               [--threshold 0.25] [--memory-threshold 0.1]
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import simpy
+
+from Models.arrivals import PoissonArrivals
+from Models.instrumentation import Profiler
+from Models.intersection import Intersection
+from Models.metrics import MetricsCollector
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baselines.json')
+VERSION = 1
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+
+def simulate(rate, duration, prio_share=0.2, lightweight=True, seed=1):
+    env = simpy.Environment()
+    intersection = Intersection(env, metrics=MetricsCollector())
+    PoissonArrivals(env, intersection, rate, random.Random(seed), prio_share, lightweight=lightweight).start()
+    profiler = Profiler()
+    profiler.run(env, until=duration)
+    return profiler.events, profiler.wall
+
+
+def render(cars=400, frames=300):
+    from Models.light_vehicles import LightVehicle
+    from visualization.visual_components import TrafficVisualizer
+
+    visualizer = TrafficVisualizer()
+    visualizer.fps = 0
+    next_id = 0
+
+    def new_vehicle(source):
+        nonlocal next_id
+        next_id += 1
+        destination = DIRECTIONS[(DIRECTIONS.index(source) + 1 + next_id % 3) % 4]
+        return LightVehicle(next_id, 0, source, destination, prio=1 if next_id % 5 == 0 else 0)
+
+    queues = {d: [new_vehicle(d) for _ in range(cars // 4)] for d in DIRECTIONS}
+    visualizer.vehicle_queues = queues
+
+    wall = 0.0
+    for frame in range(frames):
+        green = DIRECTIONS[frame // 30 % 4]
+        visualizer.light_states = {d: 'green' if d == green else 'red' for d in DIRECTIONS}
+        for direction, queue in queues.items():
+            queue.pop(0)
+            queue.append(new_vehicle(direction))
+        start = time.perf_counter()
+        visualizer.render(frame / 10)
+        wall += time.perf_counter() - start
+    return frames, wall
+
+
+# name -> (function, keyword arguments); the saturation cases all see about
+# 5000 arrivals, the intersection saturates around 1.5 arrivals per time unit
+CASES = {f'saturation_{rate}': (simulate, {'rate': rate, 'duration': 5000 / rate})
+         for rate in (0.25, 0.5, 1.0, 1.5, 2.0)}
+CASES.update({
+    'idle': (simulate, {'rate': 0.002, 'duration': 1_000_000}),
+    'preemption': (simulate, {'rate': 1.2, 'duration': 4000, 'prio_share': 0.5, 'lightweight': False}),
+    'vehicles': (simulate, {'rate': 10.0, 'duration': 1000, 'lightweight': False}),
+    'render': (render, {}),
+})
+
+
+def run_case(name, repeat):
+    """Run one case `repeat` times plus once traced; returns its results"""
+    function, kwargs = CASES[name]
+    walls = []
+    for _ in range(repeat):
+        events, wall = function(**kwargs)
+        walls.append(wall)
+    # ru_maxrss is in kilobytes on Linux; read it before tracemalloc adds its own
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    tracemalloc.start()
+    try:
+        function(**kwargs)
+        _, alloc_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    wall = min(walls)
+    return {
+        'events': events,
+        'wall': wall,
+        'events_per_sec': events / wall if wall > 0 else 0.0,
+        'peak_rss_mib': peak_rss,
+        'alloc_peak_kib': alloc_peak / 1024,
+    }
+
+
+def run_suite(names, repeat):
+    results = {}
+    # a fresh interpreter per case, so peak RSS is not inherited from the
+    # cases before it. The executor stops its worker with a message rather
+    # than SIGTERM, which SDL catches in the render case.
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(run_case, name, repeat).result()
+        r = results[name]
+        print(f"{name:<18}{r['wall']:>9.3f}s{r['events']:>10}{r['events_per_sec']:>14,.0f}"
+              f"{r['peak_rss_mib']:>10.1f}{r['alloc_peak_kib']:>12.0f}", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Return the regressions of `results` against `baseline` as messages"""
+    # metric -> (allowed relative change, True when higher is better)
+    limits = {
+        'wall': (threshold, False),
+        'events_per_sec': (threshold, True),
+        'peak_rss_mib': (memory_threshold, False),
+        'alloc_peak_kib': (memory_threshold, False),
+    }
+    regressions = []
+    for name, result in results.items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            print(f"{name}: not in the baseline")
+            continue
+        if result['events'] != base['events']:
+            # not a regression by itself, but the model no longer does the same work
+            print(f"{name}: {result['events']} events, baseline {base['events']}")
+        for metric, (limit, higher_is_better) in limits.items():
+            if not base[metric]:
+                continue
+            change = result[metric] / base[metric] - 1
+            if (-change if higher_is_better else change) > limit:
+                regressions.append(f"{name}: {metric} {result[metric]:.4g} vs baseline {base[metric]:.4g} "
+                                   f"({change:+.1%}, limit {limit:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(CASES), metavar='CASE',
+                        help=f"cases to run, of: {', '.join(CASES)}")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, the best counts")
+    parser.add_argument('--save', nargs='?', const=BASELINE, metavar='PATH', help="write the results as a baseline")
+    parser.add_argument('--compare', nargs='?', const=BASELINE, metavar='PATH', help="check against a baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed relative slow-down in wall time and events/s")
+    parser.add_argument('--memory-threshold', type=float, default=0.1,
+                        help="allowed relative growth of peak RSS and allocations")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('version') != VERSION:
+            parser.error(f"{args.compare}: unsupported baseline version {baseline.get('version')}")
+
+    print(f"{'case':<18}{'wall':>10}{'events':>10}{'events/s':>14}{'RSS MiB':>10}{'alloc KiB':>12}")
+    results = run_suite(args.only or list(CASES), args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'version': VERSION,
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'repeat': args.repeat,
+                'cases': results,
+            }, f, indent=2)
+            f.write('\n')
+        print(f"\nbaseline written to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print(f"\nno regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Headless batch runner for seeded replications.
+
+Every replication builds its own simpy.Environment, Intersection and
+random.Random, so a (scenario, rate, seed) triple always produces the same
+result no matter which worker process runs it. Replications are spread over
+a process pool and aggregated per arrival rate with t-based confidence
+intervals. compare_controllers runs the same replications under several
+signal controllers and compares them seed by seed.
+
+With Scenario.streams the arrivals come from per-attribute NumPy streams
+(Models.streams) instead of one random.Random, so a seed keeps its arrival
+times and routes when the priority share or the rate changes too. With
+Scenario.antithetic every seed is run twice, the second time with mirrored
+uniforms, and counts as one replication with the average of the two.
+"""
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import simpy
+
+from Models.arrivals import random_arrivals, trace_arrivals
+from Models.controllers import CONTROLLERS
+from Models.intersection import Intersection
+from Models.metrics import MetricsCollector, confidence_interval
+from Models.streams import ArrivalStreams
+
+
+@dataclass(frozen=True)
+class Scenario:
+    duration: float = 3600
+    rate: float = 0.2  # arrivals per time unit
+    prio_share: float = 0.2
+    time_quantum: int = 5
+    lightweight: bool = False  # LightVehicles driven by the intersection instead of a process per car
+    controller: str = 'round_robin'  # key of Models.controllers.CONTROLLERS
+    lanes: int = 1  # through and right-turn lanes per approach
+    left_lanes: int = 0  # protected left-turn lanes per approach, for the 'phased' and 'max_pressure' controllers
+    saturation_flow: float = None  # vehicles per time unit per green lane, None: one per crossing time
+    streams: bool = False  # per-attribute NumPy arrival streams (common random numbers)
+    antithetic: bool = False  # average every seed with its antithetic twin, needs streams
+
+
+def run_replication(scenario, seed, antithetic=False):
+    """
+    Run one replication and return its summary statistics as a dict.
+    antithetic runs the antithetic twin of a replication with streams.
+    """
+    env = simpy.Environment()
+    # streaming statistics, so finished vehicles are not kept around
+    metrics = MetricsCollector(quantiles=(0.9, 0.95))
+    intersection = Intersection(env, metrics=metrics, controller=CONTROLLERS[scenario.controller](),
+                                lanes=scenario.lanes, left_lanes=scenario.left_lanes,
+                                saturation_flow=scenario.saturation_flow)
+    intersection.time_quantum = scenario.time_quantum
+
+    if scenario.streams:
+        streams = ArrivalStreams(seed, rate=scenario.rate, prio_share=scenario.prio_share, antithetic=antithetic)
+        env.process(trace_arrivals(env, intersection, streams, lightweight=scenario.lightweight))
+    else:
+        rng = random.Random(seed)
+        env.process(random_arrivals(env, intersection, scenario.rate, rng,
+                                    prio_share=scenario.prio_share,
+                                    lightweight=scenario.lightweight))
+    env.run(until=scenario.duration)
+
+    summary = metrics.snapshot(env.now)
+    served = summary['served']
+    return {
+        'rate': scenario.rate,
+        'seed': seed,
+        'arrived': summary['arrived'],
+        'served': served,
+        'mean_wait': summary['mean_wait'],
+        'max_wait': summary['max_wait'],
+        'p90_wait': summary['wait_quantiles'][0.9] if served else 0.0,
+        'p95_wait': summary['wait_quantiles'][0.95] if served else 0.0,
+        'throughput': served / scenario.duration,
+    }
+
+
+def _run_task(task):
+    scenario, seed = task
+    if not scenario.antithetic:
+        return run_replication(scenario, seed)
+    if not scenario.streams:
+        raise ValueError("antithetic replications need streams=True")
+    # the pair is one replication, its statistics the average of the two
+    first = run_replication(scenario, seed)
+    second = run_replication(scenario, seed, antithetic=True)
+    return {key: value if key in ('rate', 'seed') else (value + second[key]) / 2 for key, value in first.items()}
+
+
+def summarize(results, metrics=('mean_wait', 'max_wait', 'p90_wait', 'p95_wait', 'throughput')):
+    """Aggregate replication results per arrival rate"""
+    by_rate = {}
+    for result in results:
+        by_rate.setdefault(result['rate'], []).append(result)
+
+    summary = []
+    for rate in sorted(by_rate):
+        group = by_rate[rate]
+        row = {'rate': rate, 'replications': len(group)}
+        for metric in metrics:
+            mean, half_width = confidence_interval([r[metric] for r in group])
+            row[metric] = mean
+            row[metric + '_ci'] = half_width
+        summary.append(row)
+    return summary
+
+
+def run_batch(scenario, rates, seeds, workers=None):
+    """
+    Run every rate in `rates` with every seed in `seeds`.
+
+    Args:
+        scenario: base Scenario, its rate is replaced by each swept rate
+        rates: iterable of arrival rates
+        seeds: iterable of integer seeds (or an int N meaning seeds 0..N-1)
+        workers: number of worker processes, None for os.cpu_count(), 1 to run inline
+
+    Returns:
+        (summary rows per rate, raw per-replication results)
+    """
+    if isinstance(seeds, int):
+        seeds = range(seeds)
+    tasks = [(replace(scenario, rate=rate), seed) for rate in rates for seed in seeds]
+
+    if workers == 1:
+        results = [_run_task(task) for task in tasks]
+    else:
+        workers = workers or os.cpu_count() or 1
+        # a few chunks per worker keeps IPC overhead low while still balancing load
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_task, tasks, chunksize=chunksize))
+
+    return summarize(results), results
+
+
+def compare_controllers(scenario, controllers, rates, seeds, metrics=('mean_wait', 'p95_wait', 'throughput'),
+                        workers=None):
+    """
+    Run the replications of run_batch under every controller in `controllers`.
+
+    The arrivals of a (rate, seed) pair do not depend on the controller, so
+    the replications are paired by seed. Every controller gets the mean of
+    its per-seed difference to the first controller, with a confidence
+    interval that is much narrower than the two separate intervals.
+
+    Returns:
+        (summary rows per controller and rate, raw results per controller)
+    """
+    if isinstance(seeds, int):
+        seeds = range(seeds)
+    raw = {}
+    for controller in controllers:
+        _, raw[controller] = run_batch(replace(scenario, controller=controller), rates, seeds, workers=workers)
+
+    reference = {(r['rate'], r['seed']): r for r in raw[controllers[0]]}
+    rows = []
+    for controller in controllers:
+        for row in summarize(raw[controller], metrics):
+            group = [r for r in raw[controller] if r['rate'] == row['rate']]
+            for metric in metrics:
+                mean, half_width = confidence_interval(
+                    [r[metric] - reference[r['rate'], r['seed']][metric] for r in group])
+                row[metric + '_diff'] = mean
+                row[metric + '_diff_ci'] = half_width
+            rows.append({'controller': controller, **row})
+    return rows, raw
@@ -1,20 +1,94 @@
+import argparse
+
 import simpy
+from Models.arrivals import trace_arrivals
+from Models.event_log import EventLog, ConsoleSink, JsonlSink, DEBUG
+from Models.instrumentation import Profiler, format_report
 from Models.intersection import Intersection
+from Models.metrics import MetricsCollector, format_snapshot
+from Models.recorder import TrajectoryRecorder
+from Models.steady_state import SteadyStateMonitor, format_report as format_steady_state
+from Models.traces import read_trace
 from Models.vehicles import Vehicle
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Simulate one intersection")
+    parser.add_argument('--trace', help="replay arrivals from a .csv or .npy trace instead of the built-in vehicles")
+    parser.add_argument('--duration', type=float, default=None,
+                        help="simulated time (default: 20, or until a trace is exhausted)")
+    parser.add_argument('--quiet', action='store_true', help="do not print every event")
+    parser.add_argument('--profile', action='store_true', help="time the hot paths and print a profile")
+    parser.add_argument('--precision', type=float, default=None,
+                        help="stop once the steady-state mean wait and queue length are known to within this "
+                             "relative half width, --duration is then only the horizon")
+    parser.add_argument('--record', metavar='DIR',
+                        help="write every vehicle's id, route, priority and arrival, green and exit times to DIR")
+    parser.add_argument('--log', metavar='FILE',
+                        help="write every event as JSON lines to FILE instead of printing it, for replay_main.py")
+    args = parser.parse_args()
+
     # Create simulation environment
     env = simpy.Environment()
 
-    # Create intersection
-    intersection = Intersection(env)
+    # Create intersection, printing every event to the console
+    metrics = MetricsCollector()
+    if args.log:
+        log = EventLog(JsonlSink(args.log), level=DEBUG)
+    else:
+        log = EventLog() if args.quiet else EventLog(ConsoleSink(), level=DEBUG)
+    profiler = Profiler() if args.profile else None
+    recorder = TrajectoryRecorder(args.record) if args.record else None
+    intersection = Intersection(env, log=log, metrics=metrics, profiler=profiler, recorder=recorder)
+
+    if args.trace:
+        # vehicles are created lazily as the trace is read
+        arrivals = env.process(trace_arrivals(env, intersection, read_trace(args.trace), lightweight=True))
+    else:
+        arrivals = [vehicle.process for vehicle in builtin_vehicles(env, intersection)]
+    monitor = SteadyStateMonitor(env, intersection, arrivals, precision=args.precision) if args.precision else None
+
+    # Run simulation, a trace without --duration until it is exhausted
+    print("Starting traffic simulation")
+    if args.duration is not None:
+        if args.duration < 0:
+            parser.error("--duration must not be negative")
+        until = args.duration
+    else:
+        until = None if args.trace else 20
+    if monitor is not None:
+        if not until:
+            parser.error("--precision needs a positive --duration horizon")
+        report = intersection.run(duration=until, monitor=monitor)
+    elif until == 0:
+        # SimPy cannot run until the current time; there is nothing to do
+        pass
+    elif profiler is not None:
+        profiler.run(env, until=until)
+    elif until is None:
+        env.run()
+    else:
+        intersection.run(duration=until)
 
-    # Start vehicle generator process
-    #env.process(vehicle_generator(env, intersection, rate=0.2))
+    log.close()
 
+    # Print final statistics
+    print("\n=== Final Statistics ===")
+    print(f"Simulation ended at time: {env.now:.1f}")
+    print(format_snapshot(metrics.snapshot(env.now)))
+    if recorder is not None:
+        print(f"Recorded {recorder.close()} vehicles to {args.record}")
+    if monitor is not None:
+        print("\n=== Steady State ===")
+        print(format_steady_state(report))
+    if profiler is not None:
+        print("\n=== Profile ===")
+        print(format_report(profiler.report()))
+
+
+def builtin_vehicles(env, intersection):
     # Create 6 vehicles with different arrival times, sources, destinations and priorities
-    vehicles = [
+    return [
         # Vehicle 1: Arrives at time 0 from North to South
         Vehicle(env=env, id=1, at=0, source='N', destination='S',
                 intersection=intersection, prio=0),
@@ -40,13 +114,6 @@ def main():
                 intersection=intersection, prio=0)
     ]
 
-    # Run simulation
-    print("Starting traffic simulation")
-    intersection.run(duration=20)
-
-    # Print final statistics
-    print("\n=== Final Statistics ===")
-    print(f"Simulation ended at time: {env.now:.1f}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,21 @@
+import argparse
+
+from visualization.replay import ReplayLog, ReplayViewer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a run recorded with main.py --log")
+    parser.add_argument('log', help="JSON lines event log")
+    parser.add_argument('--speed', type=float, default=1.0, help="simulated time units per wall-clock second")
+    parser.add_argument('--start', type=float, default=0.0, help="simulated time to start playing from")
+    parser.add_argument('--keyframe-interval', type=float, default=30.0,
+                        help="simulated time between the keyframes seeking starts from")
+    args = parser.parse_args()
+
+    # Index the recording, then play it with the simulation's renderer
+    log = ReplayLog.from_jsonl(args.log, args.keyframe_interval)
+    ReplayViewer(log).run(speed=args.speed, start=args.start)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,36 @@
 import simpy
+from Models.arrivals import trace_arrivals
+from Models.event_log import EventLog, ConsoleSink, DEBUG
 from Models.intersection import Intersection
+from Models.streams import ArrivalStreams
 from Models.vehicles import Vehicle
 from visualization.visual_simulation import VisualAdapter
-import random
 
-def setup_vehicle_generator(env, intersection):
+def setup_vehicle_generator(env, intersection, seed=None):
     """
     Sets up a continuous vehicle generator process that creates vehicles
     with random properties at random intervals throughout the simulation.
+    Every property is drawn from its own random stream, so a seed replays
+    the same vehicles whatever the signals do.
 
     Args:
         env: SimPy environment
         intersection: Intersection instance
+        seed: seed of the streams, None for a fresh one
     """
-    def vehicle_generator():
-        vehicle_id = 1
-
-        # Define possible vehicle routes
-        directions = ['N', 'S', 'E', 'W']
-
-        while True:
-            # Random arrival time interval between 1-5 time units
-            arrival_interval = random.uniform(1, 5)
-            yield env.timeout(arrival_interval)
-
-            # Generate random vehicle properties
-            source = random.choice(directions)
-
-            # Avoid having the destination be the same as the source
-            possible_destinations = [d for d in directions if d != source]
-            destination = random.choice(possible_destinations)
-
-            # 20% chance of priority vehicle
-            priority = 1 if random.random() < 0.2 else 0
-
-            # Create and add the vehicle
-            Vehicle(
-                env=env,
-                id=vehicle_id,
-                at=env.now,
-                source=source,
-                destination=destination,
-                intersection=intersection,
-                prio=priority
-            )
-
-            print(f"Vehicle {vehicle_id}: {source}->{destination} Status waiting, "
-                  f"Arrival Time {env.now}, Wait Time 0, Priority {priority}")
-
-            vehicle_id += 1
+    # Random arrival time interval between 1-5 time units, routes between
+    # two different sides, 20% chance of priority vehicle
+    streams = ArrivalStreams(seed, interval=(1, 5), prio_share=0.2)
 
     # Start the generator process
-    return env.process(vehicle_generator())
+    return env.process(trace_arrivals(env, intersection, streams))
 
 def main():
     # Create simulation environment
     env = simpy.Environment()
 
-    # Create intersection
-    intersection = Intersection(env)
+    # Create intersection, printing every event to the console
+    intersection = Intersection(env, log=EventLog(ConsoleSink(), level=DEBUG))
 
     # Create visualization adapter
     visual_adapter = VisualAdapter(intersection, env)
@@ -94,9 +66,7 @@ def main():
 
     # Run visual simulation
     print("Starting visual traffic simulation")
-    # visual_adapter.start_rendering_loop(fps=5)
-
-    visual_adapter.run_visual_simulation(duration=20)
+    visual_adapter.run_visual_simulation(duration=20, time_scale=2.0)
 
     # Print final statistics
     print("\n=== Final Statistics ===")
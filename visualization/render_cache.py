@@ -0,0 +1,36 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class RenderCache:
+    """
+    Pre-rendered surfaces for the visualizer: the car sprites rotated once
+    into every queue orientation, and an LRU of rendered text labels so
+    unchanged labels are not re-rendered every frame.
+    """
+
+    def __init__(self, car_normal, car_priority, angles=(0, 90, 180, 270), label_capacity=1024):
+        self.sprites = {}
+        for angle in angles:
+            self.sprites[False, angle] = pygame.transform.rotate(car_normal, angle)
+            self.sprites[True, angle] = pygame.transform.rotate(car_priority, angle)
+
+        self.labels = OrderedDict()
+        self.label_capacity = label_capacity
+
+    def sprite(self, priority, angle):
+        return self.sprites[bool(priority), angle]
+
+    def label(self, font, text, color):
+        key = (id(font), text, color)
+        surface = self.labels.get(key)
+        if surface is not None:
+            self.labels.move_to_end(key)
+            return surface
+
+        surface = font.render(text, True, color)
+        self.labels[key] = surface
+        if len(self.labels) > self.label_capacity:
+            self.labels.popitem(last=False)
+        return surface
@@ -0,0 +1,233 @@
+"""
+Playback of recorded runs without re-simulating them.
+
+A ReplayLog turns an event log (JsonlSink file or RingBufferSink records)
+into a time-ordered list of deltas: a vehicle joining its approach queue
+('arrive'), leaving it ('dequeue', or 'cross_end' in logs without DEBUG
+events) and a signal changing ('light'). While reading them it stores a
+keyframe every `keyframe_interval` time units: the light states and the
+full queues, with the number of deltas applied so far.
+
+A ReplayCursor rebuilds the state at any time t by bisecting the keyframe
+times and the delta times, O(log n), then applying only the deltas between
+the nearest keyframe before t and t. Moving forward from where it is, as
+when playing, it applies just the deltas since its last position.
+
+ReplayViewer draws the cursor's frames with the TrafficVisualizer: space
+pauses, left/right seeks by `seek_step`, up/down doubles or halves the
+speed, Home/End jump to the ends, and clicking or dragging on the timeline
+bar scrubs.
+"""
+import time
+from bisect import bisect_right
+from itertools import islice
+from types import MappingProxyType
+
+import pygame
+
+from Models.event_log import read_jsonl
+from visualization.visual_components import TrafficVisualizer
+from visualization.visual_simulation import Frame, VehicleView
+
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+# delta kinds
+ARRIVE, LEAVE, LIGHT = range(3)
+
+
+class ReplayLog:
+    """
+    Args:
+        records: (time, level, event, fields) event records in time order, as
+            kept by a RingBufferSink or read by event_log.read_jsonl
+        keyframe_interval: simulated time between two keyframes
+    """
+
+    def __init__(self, records, keyframe_interval=30.0):
+        self.keyframe_interval = keyframe_interval
+        self.times = []
+        self.deltas = []  # (kind, queue or signal, vehicle view or vehicle id or light state)
+        self.keyframe_times = [0.0]
+        # (deltas applied, lights, queues); every run starts with all lights
+        # red and nobody queued
+        lights = dict.fromkeys(DIRECTIONS, 'red')
+        self.keyframes = [(0, dict(lights), {direction: {} for direction in DIRECTIONS})]
+
+        queues = {direction: {} for direction in DIRECTIONS}
+        sources = {}  # vehicle id -> queue, to resolve cross_end
+        next_keyframe = keyframe_interval
+        for time, _, event, fields in records:
+            if event == 'arrive':
+                view = VehicleView(fields['vehicle'], fields['prio'], fields['source'], fields['destination'])
+                sources[view.id] = view.source
+                delta = (ARRIVE, view.source, view)
+            elif event == 'dequeue' or event == 'cross_end':
+                source = sources.pop(fields['vehicle'], None)
+                if source is None:
+                    # already dequeued, or arrived before the log started
+                    continue
+                delta = (LEAVE, source, fields['vehicle'])
+            elif event == 'light':
+                delta = (LIGHT, fields['direction'], fields['state'])
+            else:
+                continue
+
+            if time >= next_keyframe:
+                # every delta so far happened before next_keyframe
+                self.keyframe_times.append(next_keyframe)
+                self.keyframes.append((len(self.deltas), dict(lights),
+                                       {direction: dict(vehicles) for direction, vehicles in queues.items()}))
+                next_keyframe = (time // keyframe_interval + 1) * keyframe_interval
+            apply(lights, queues, (delta,))
+            self.times.append(time)
+            self.deltas.append(delta)
+
+        self.end = self.times[-1] if self.times else 0.0
+
+    @classmethod
+    def from_jsonl(cls, path, keyframe_interval=30.0):
+        """Index the event log a JsonlSink wrote to `path`"""
+        return cls(read_jsonl(path), keyframe_interval)
+
+    def __len__(self):
+        return len(self.deltas)
+
+
+def apply(lights, queues, deltas):
+    """Apply `deltas` to the light states and queues in place"""
+    for kind, key, value in deltas:
+        if kind == ARRIVE:
+            queues[key][value.id] = value
+        elif kind == LEAVE:
+            queues[key].pop(value, None)
+        else:
+            lights[key] = value
+
+
+class ReplayCursor:
+    """The state of a ReplayLog at a movable point in time"""
+
+    def __init__(self, log, visible_vehicles=16):
+        self.log = log
+        self.visible_vehicles = visible_vehicles
+        self.time = 0.0
+        self._restore(0)
+
+    def _restore(self, index):
+        position, lights, queues = self.log.keyframes[index]
+        self.position = position  # deltas applied
+        self.lights = dict(lights)
+        self.queues = {direction: dict(vehicles) for direction, vehicles in queues.items()}
+
+    def seek(self, t):
+        """Move to time t and return the Frame to draw there"""
+        log = self.log
+        end = bisect_right(log.times, t)
+        keyframe = bisect_right(log.keyframe_times, t) - 1
+        # replay forward from here unless a keyframe is closer
+        if end < self.position or log.keyframes[keyframe][0] > self.position:
+            self._restore(keyframe)
+        # a slice, since islice would step over the first `position` deltas
+        apply(self.lights, self.queues, log.deltas[self.position:end])
+        self.position = end
+        self.time = t
+        return self.frame()
+
+    def frame(self):
+        vehicle_queues = {direction: tuple(islice(vehicles.values(), self.visible_vehicles))
+                          for direction, vehicles in self.queues.items()}
+        return Frame(self.time, MappingProxyType(dict(self.lights)), MappingProxyType(vehicle_queues))
+
+
+class ReplayViewer:
+    """
+    Args:
+        log: ReplayLog to play
+        seek_step: simulated time skipped by the left and right keys
+        visible_vehicles: vehicles per queue put in a frame
+    """
+
+    def __init__(self, log, seek_step=10.0, visible_vehicles=16):
+        self.log = log
+        self.cursor = ReplayCursor(log, visible_vehicles)
+        self.seek_step = seek_step
+        self.visualizer = TrafficVisualizer()
+        self.visualizer.timeline = 0.0
+        self.visualizer.add_event_listener(self._handle_event)
+        self.time = 0.0
+        self.speed = 1.0
+        self.dragging = False
+
+    def _handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_RIGHT:
+                self.seek(self.time + self.seek_step)
+            elif event.key == pygame.K_LEFT:
+                self.seek(self.time - self.seek_step)
+            elif event.key == pygame.K_UP:
+                self.speed *= 2
+            elif event.key == pygame.K_DOWN:
+                self.speed /= 2
+            elif event.key == pygame.K_HOME:
+                self.seek(0.0)
+            elif event.key == pygame.K_END:
+                self.seek(self.log.end)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            rect = self.visualizer.timeline_rect().inflate(0, 12)
+            if rect.collidepoint(event.pos):
+                self.dragging = True
+                self.scrub(event.pos[0])
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            self.scrub(event.pos[0])
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.dragging = False
+
+    def seek(self, t):
+        """Jump to time t, clamped to the recording"""
+        self.time = min(max(t, 0.0), self.log.end)
+
+    def scrub(self, x):
+        rect = self.visualizer.timeline_rect()
+        self.seek((x - rect.x) / rect.width * self.log.end)
+
+    def show(self, frame):
+        """Make `frame` the state drawn by the next render"""
+        visualizer = self.visualizer
+        visualizer.simulation_time = frame.time
+        visualizer.light_states = frame.light_states
+        visualizer.vehicle_queues = frame.vehicle_queues
+        visualizer.timeline = frame.time / self.log.end if self.log.end else 0.0
+        visualizer.status_text = (f"Replay x{self.speed:g} of {self.log.end:.1f} - "
+                                  f"LEFT/RIGHT seek, UP/DOWN speed, click the bar to scrub")
+
+    def run(self, speed=1.0, start=0.0, fps=30, max_frame_time=0.25, close_at_end=False):
+        """
+        Play the recording from `start` at `speed` simulated time units per
+        wall-clock second until the window is closed, or until the end with
+        close_at_end. Playback pauses at the end, where it can be scrubbed.
+        """
+        print(f"Replaying {len(self.log)} events up to time {self.log.end:.1f} at x{speed:g}")
+        self.visualizer.fps = fps
+        self.speed = speed
+        self.seek(start)
+
+        last = time.perf_counter()
+        while self.visualizer.running:
+            running, paused = self.visualizer.process_events()
+            if not running:
+                break
+
+            now = time.perf_counter()
+            elapsed = min(now - last, max_frame_time)
+            last = now
+            if not paused and not self.dragging:
+                self.seek(self.time + elapsed * self.speed)
+
+            self.show(self.cursor.seek(self.time))
+            self.visualizer.render()
+            if self.time >= self.log.end:
+                if close_at_end:
+                    break
+                self.visualizer.paused = True
+
+        print(f"Replay stopped at time {self.time:.1f}")
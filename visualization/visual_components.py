@@ -1,6 +1,8 @@
 import pygame
 import sys
 
+from visualization.render_cache import RenderCache
+
 class TrafficVisualizer:
     def __init__(self, width=800, height=800):
         pygame.init()
@@ -21,8 +23,18 @@ class TrafficVisualizer:
         self.purple = (128, 0, 128)
         self.background_green = (100, 200, 100)
 
-        # Font
+        # Fonts
         self.font = pygame.font.SysFont('Arial', 16)
+        self.bold_font = pygame.font.SysFont('Arial', 18, bold=True)
+        self.fps = 30  # frame rate cap, 0 for uncapped
+
+        # dirty-rectangle rendering: regions drawn in the last frame, None
+        # until the first full frame
+        self.partial_updates = True
+        self.last_regions = None
+
+        # optional instrumentation.Profiler timing the steps of render()
+        self.profiler = None
 
         # Simulation time and states
         self.simulation_time = 0
@@ -32,6 +44,13 @@ class TrafficVisualizer:
         # Simulation control
         self.running = True
         self.paused = False
+        # callbacks(event) run for every pygame event besides QUIT
+        self.event_listeners = []
+
+        # optional progress through a replay in [0, 1], drawn as a bar along
+        # the bottom, and an extra line of simulation info
+        self.timeline = None
+        self.status_text = None
 
         # Load car images
         self.car_normal = pygame.image.load('assets/car_normal.png').convert_alpha()
@@ -51,6 +70,13 @@ class TrafficVisualizer:
         self.car_normal = pygame.transform.smoothscale(self.car_normal, (target_width, target_height))
         self.car_priority = pygame.transform.smoothscale(self.car_priority, (target_width, target_height))
 
+        # rotated sprites and text labels, plus everything that never changes
+        # (roads, markings, light housings) composited once
+        self.cache = RenderCache(self.car_normal, self.car_priority)
+        self.background = pygame.Surface((width, height)).convert()
+        self.paint_background(self.background)
+        self.paint_light_housings(self.background)
+
     def process_events(self):
         """Handle pygame events"""
         for event in pygame.event.get():
@@ -61,19 +87,29 @@ class TrafficVisualizer:
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
                     self.paused = not self.paused
+            for callback in self.event_listeners:
+                callback(event)
 
         return self.running, self.paused
 
+    def add_event_listener(self, callback):
+        """Call callback(event) for every pygame event but QUIT"""
+        self.event_listeners.append(callback)
+
     def draw_background(self):
-        """Draw the background and roads"""
-        self.screen.fill(self.background_green)
+        """Blit the pre-composited static layer"""
+        self.screen.blit(self.background, (0, 0))
+
+    def paint_background(self, surface):
+        """Paint the grass, roads and lane markings onto `surface`"""
+        surface.fill(self.background_green)
 
         # Draw roads
         road_width = 100
         # North-South road
-        pygame.draw.rect(self.screen, self.gray, (self.width/2 - road_width/2, 0, road_width, self.height))
+        pygame.draw.rect(surface, self.gray, (self.width/2 - road_width/2, 0, road_width, self.height))
         # East-West road
-        pygame.draw.rect(self.screen, self.gray, (0, self.height/2 - road_width/2, self.width, road_width))
+        pygame.draw.rect(surface, self.gray, (0, self.height/2 - road_width/2, self.width, road_width))
 
         # Draw lane markings
         lane_marking_length = 40
@@ -83,83 +119,87 @@ class TrafficVisualizer:
         # North-South lane markings
         for y in range(0, self.height, lane_gap):
             if not (self.height/2 - road_width < y < self.height/2 + road_width):  # Skip intersection
-                pygame.draw.rect(self.screen, self.white,
+                pygame.draw.rect(surface, self.white,
                                 (self.width/2 - lane_marking_width/2, y, lane_marking_width, lane_marking_length))
 
         # East-West lane markings
         for x in range(0, self.width, lane_gap):
             if not (self.width/2 - road_width < x < self.width/2 + road_width):  # Skip intersection
-                pygame.draw.rect(self.screen, self.white,
+                pygame.draw.rect(surface, self.white,
                                 (x, self.height/2 - lane_marking_width/2, lane_marking_length, lane_marking_width))
 
-    def draw_traffic_lights(self):
-                """Draw the traffic lights as flat boxes across the roads"""
-                light_box_width = 80  # Now wider, oriented parallel to the road
-                light_box_height = 30  # Now shorter
-                light_radius = 10
-
-                light_positions = {
-                    'N': (self.width/2 + 60, self.height/2 - 70),  # North
-                    'S': (self.width/2 - 60, self.height/2 + 70),  # South
-                    'E': (self.width/2 + 70, self.height/2 + 60),  # East
-                    'W': (self.width/2 - 70, self.height/2 - 60),  # West
-                }
-
-                for direction, position in light_positions.items():
-                    is_vertical = direction in ['N', 'S']
-
-                    if is_vertical:
-                        box_rect = pygame.Rect(position[0] - light_box_width/2,
-                                            position[1] - light_box_height/2,
-                                            light_box_width, light_box_height)
-                    # For horizontal roads, make the box horizontal but in the right orientation
-                    else:
-                        box_rect = pygame.Rect(position[0] - light_box_height/2,
-                                            position[1] - light_box_width/2,
-                                            light_box_height, light_box_width)
-
-                    pygame.draw.rect(self.screen, self.black, box_rect)
-                    pygame.draw.rect(self.screen, (50, 50, 50), box_rect, 2)  # Gray border
-
-                    # Calculate positions for the three lights (red, yellow, green)
-                    if is_vertical:
-                        red_pos = (position[0] - light_box_width/4, position[1])
-                        yellow_pos = (position[0], position[1])
-                        green_pos = (position[0] + light_box_width/4, position[1])
-                    else:
-                        red_pos = (position[0], position[1] - light_box_width/4)
-                        yellow_pos = (position[0], position[1])
-                        green_pos = (position[0], position[1] + light_box_width/4)
-
-                    # Draw all three lights (dimmed when inactive)
-                    pygame.draw.circle(self.screen, (100, 0, 0), red_pos, light_radius)  # Dimmed red
-                    pygame.draw.circle(self.screen, (100, 100, 0), yellow_pos, light_radius)  # Dimmed yellow
-                    pygame.draw.circle(self.screen, (0, 100, 0), green_pos, light_radius)  # Dimmed green
-
-                    #Active light
-                    if self.light_states[direction] == 'green':
-                        pygame.draw.circle(self.screen, self.green, green_pos, light_radius)
-                    elif self.light_states[direction] == 'red':
-                        pygame.draw.circle(self.screen, self.red, red_pos, light_radius)
-
-                    # Add direction label
-                    text = self.font.render(direction, True, self.white)
-                    if is_vertical:
-                        text_rect = text.get_rect(center=(position[0], position[1] - light_box_height/2 - 15))
-                    else:
-                        text_rect = text.get_rect(center=(position[0] - light_box_height/2 - 15, position[1]))
-                    self.screen.blit(text, text_rect)
+    def light_layout(self):
+        """Yield (direction, box_rect, red_pos, yellow_pos, green_pos, label_center) for every light"""
+        light_box_width = 80  # Now wider, oriented parallel to the road
+        light_box_height = 30  # Now shorter
 
-    def draw_vehicles(self):
-        """Draw vehicles in each queue as PNG sprites"""
+        light_positions = {
+            'N': (self.width/2 + 60, self.height/2 - 70),  # North
+            'S': (self.width/2 - 60, self.height/2 + 70),  # South
+            'E': (self.width/2 + 70, self.height/2 + 60),  # East
+            'W': (self.width/2 - 70, self.height/2 - 60),  # West
+        }
+
+        for direction, position in light_positions.items():
+            is_vertical = direction in ['N', 'S']
+
+            if is_vertical:
+                box_rect = pygame.Rect(position[0] - light_box_width/2,
+                                       position[1] - light_box_height/2,
+                                       light_box_width, light_box_height)
+            # For horizontal roads, make the box horizontal but in the right orientation
+            else:
+                box_rect = pygame.Rect(position[0] - light_box_height/2,
+                                       position[1] - light_box_width/2,
+                                       light_box_height, light_box_width)
+
+            # Calculate positions for the three lights (red, yellow, green)
+            if is_vertical:
+                red_pos = (position[0] - light_box_width/4, position[1])
+                yellow_pos = (position[0], position[1])
+                green_pos = (position[0] + light_box_width/4, position[1])
+                label_center = (position[0], position[1] - light_box_height/2 - 15)
+            else:
+                red_pos = (position[0], position[1] - light_box_width/4)
+                yellow_pos = (position[0], position[1])
+                green_pos = (position[0], position[1] + light_box_width/4)
+                label_center = (position[0] - light_box_height/2 - 15, position[1])
+
+            yield direction, box_rect, red_pos, yellow_pos, green_pos, label_center
+
+    def paint_light_housings(self, surface):
+        """Paint the light boxes, dimmed lights and direction labels onto `surface`"""
+        light_radius = 10
+        for direction, box_rect, red_pos, yellow_pos, green_pos, label_center in self.light_layout():
+            pygame.draw.rect(surface, self.black, box_rect)
+            pygame.draw.rect(surface, (50, 50, 50), box_rect, 2)  # Gray border
+
+            # Draw all three lights (dimmed when inactive)
+            pygame.draw.circle(surface, (100, 0, 0), red_pos, light_radius)  # Dimmed red
+            pygame.draw.circle(surface, (100, 100, 0), yellow_pos, light_radius)  # Dimmed yellow
+            pygame.draw.circle(surface, (0, 100, 0), green_pos, light_radius)  # Dimmed green
+
+            # Add direction label
+            text = self.font.render(direction, True, self.white)
+            surface.blit(text, text.get_rect(center=label_center))
+
+    def draw_traffic_lights(self):
+        """Light up the active lamp of each traffic light"""
+        light_radius = 10
+        for direction, _, red_pos, _, green_pos, _ in self.light_layout():
+            if self.light_states[direction] == 'green':
+                pygame.draw.circle(self.screen, self.green, green_pos, light_radius)
+            elif self.light_states[direction] == 'red':
+                pygame.draw.circle(self.screen, self.red, red_pos, light_radius)
+
+    def vehicle_layout(self):
+        """Yield (direction, vehicle, sprite, car_rect, label, label_rect) for every car on screen"""
         road_width = 100  # Match your road width from draw_background
         lane_offset = road_width / 4  # Half of half the road width to position in the correct lane
 
         # Adjust vehicle spacing - increase or decrease these values to change spacing
         vehicle_spacing = 80
 
-        bold_font = pygame.font.SysFont('Arial', 18, bold=True)
-
         queue_positions = {
             'N': {'x': self.width / 2 + lane_offset, 'y': self.height / 2 - 150, 'dx': 0, 'dy': -vehicle_spacing,
                   'angle': 180},
@@ -171,53 +211,150 @@ class TrafficVisualizer:
                   'angle': 270},
         }
 
+        screen_rect = self.screen.get_rect()
         for direction, vehicles in self.vehicle_queues.items():
             pos = queue_positions[direction]
             for i, vehicle in enumerate(vehicles):
                 x = pos['x'] + i * pos['dx']
                 y = pos['y'] + i * pos['dy']
 
-                # Select car image based on priority
-                car_img = self.car_priority if vehicle.prio > 0 else self.car_normal
-
-                # Just rotate without any extra scaling
-                rotated_car = pygame.transform.rotate(car_img, pos['angle'])
+                # Pre-rotated sprite selected by priority and queue orientation
+                rotated_car = self.cache.sprite(vehicle.prio > 0, pos['angle'])
 
                 # Get rect for centered positioning
                 car_rect = rotated_car.get_rect(center=(x, y))
-
-                # Draw the car
-                self.screen.blit(rotated_car, car_rect)
-
-                # Draw vehicle ID and destination
-                text = bold_font.render(f"{vehicle.id} : {vehicle.source}->{vehicle.destination}", True, self.black)
+                if not car_rect.inflate(200, 120).colliderect(screen_rect):
+                    # car and label are off screen; queues grow away from the
+                    # junction, so the rest of this one is too
+                    break
+
+                # Vehicle ID and destination
+                text = self.cache.label(self.bold_font, f"{vehicle.id} : {vehicle.source}->{vehicle.destination}",
+                                        self.black)
                 text_rect = text.get_rect(center=(x, y - 45))  # Position text above car
-                self.screen.blit(text, text_rect)
+                yield direction, vehicle, rotated_car, car_rect, text, text_rect
 
-    def draw_simulation_info(self):
-        """Draw simulation information"""
-        info_text = f"Simulation Time: {self.simulation_time:.1f}"
-        text_surface = self.font.render(info_text, True, self.black)
-        self.screen.blit(text_surface, (10, 10))
+    def draw_vehicles(self):
+        """Draw vehicles in each queue as PNG sprites"""
+        for _, _, rotated_car, car_rect, text, text_rect in self.vehicle_layout():
+            self.screen.blit(rotated_car, car_rect)
+            self.screen.blit(text, text_rect)
 
+    def info_layout(self):
+        """Return the (text, color, position) of the simulation info lines"""
+        info_text = f"Simulation Time: {self.simulation_time:.1f}"
         if self.paused:
-            pause_text = "PAUSED - Press SPACE to continue"
-            pause_surface = self.font.render(pause_text, True, self.red)
-            self.screen.blit(pause_surface, (10, 40))
+            status = ("PAUSED - Press SPACE to continue", self.red)
         else:
-            controls_text = "Press SPACE to pause"
-            controls_surface = self.font.render(controls_text, True, self.black)
-            self.screen.blit(controls_surface, (10, 40))
-
-    def render(self, simulation_time=None):
-        """Render the current state"""
-        if simulation_time is not None:
-            self.simulation_time = simulation_time
+            status = ("Press SPACE to pause", self.black)
+        lines = [(info_text, self.black, (10, 10)), (*status, (10, 40))]
+        if self.status_text:
+            lines.append((self.status_text, self.black, (10, 70)))
+        return lines
 
+    def draw_simulation_info(self):
+        """Draw simulation information"""
+        for text, color, position in self.info_layout():
+            self.screen.blit(self.cache.label(self.font, text, color), position)
+
+    def timeline_rect(self):
+        return pygame.Rect(10, self.height - 24, self.width - 20, 12)
+
+    def draw_timeline(self):
+        """Draw the replay progress bar, if there is one"""
+        if self.timeline is None:
+            return
+        rect = self.timeline_rect()
+        pygame.draw.rect(self.screen, self.white, rect)
+        pygame.draw.rect(self.screen, self.blue, (rect.x, rect.y, self.timeline_width(rect), rect.height))
+        pygame.draw.rect(self.screen, self.black, rect, 1)
+
+    def timeline_width(self, rect):
+        return int(rect.width * min(max(self.timeline, 0.0), 1.0))
+
+    def scene_regions(self):
+        """
+        Map every independently changing part of the scene to (signature,
+        rect): a region has to be redrawn when its signature changes, over
+        its old and new rect.
+        """
+        regions = {}
+        for direction, box_rect, _, _, _, _ in self.light_layout():
+            regions['light', direction] = (self.light_states[direction], box_rect)
+
+        queues = {}
+        for direction, vehicle, _, car_rect, _, text_rect in self.vehicle_layout():
+            signature, rect = queues.get(direction, ((), None))
+            signature += ((vehicle.id, vehicle.prio > 0, vehicle.source, vehicle.destination),)
+            rect = car_rect.union(text_rect) if rect is None else rect.unionall([car_rect, text_rect])
+            queues[direction] = (signature, rect)
+        for direction, region in queues.items():
+            regions['queue', direction] = region
+
+        info = self.info_layout()
+        rects = [self.cache.label(self.font, text, color).get_rect(topleft=position)
+                 for text, color, position in info]
+        regions['info'] = (tuple(line[:2] for line in info), rects[0].unionall(rects[1:]))
+
+        if self.timeline is not None:
+            rect = self.timeline_rect()
+            regions['timeline'] = (self.timeline_width(rect), rect)
+        return regions
+
+    def dirty_rects(self, regions):
+        """Rects covering every region that changed since the last frame"""
+        rects = []
+        for key in regions.keys() | self.last_regions.keys():
+            new = regions.get(key)
+            old = self.last_regions.get(key)
+            if new is None or old is None:
+                rects.append((new or old)[1])
+            elif new[0] != old[0]:
+                rects.append(new[1].union(old[1]))
+        return rects
+
+    def draw_scene(self):
         self.draw_background()
         self.draw_traffic_lights()
         self.draw_vehicles()
         self.draw_simulation_info()
+        self.draw_timeline()
 
-        pygame.display.flip()
-        self.clock.tick(30)  # 30 FPS
\ No newline at end of file
+    def render(self, simulation_time=None):
+        """Render the current state, redrawing only what changed since the last frame"""
+        if simulation_time is not None:
+            self.simulation_time = simulation_time
+        lap = self.profiler.laps('render') if self.profiler is not None else _no_lap
+
+        regions = self.scene_regions()
+        lap('layout')
+        if not self.partial_updates or self.last_regions is None:
+            self.draw_scene()
+            lap('draw')
+            pygame.display.flip()
+            lap('present')
+        else:
+            rects = self.dirty_rects(regions)
+            # the scene is drawn once, clipped to the union of the dirty
+            # rects, so overlapping elements keep their stacking order and
+            # the cost does not grow with the number of rects
+            if rects:
+                self.screen.set_clip(rects[0].unionall(rects[1:]))
+                self.draw_scene()
+                self.screen.set_clip(None)
+            lap('draw')
+            if rects:
+                pygame.display.update(rects)
+            lap('present')
+        self.last_regions = regions
+
+        self.clock.tick(self.fps)
+        lap('frame_cap')
+
+    def invalidate(self):
+        """Force a full redraw on the next frame"""
+        self.last_regions = None
+
+
+def _no_lap(name):
+    pass
@@ -1,123 +1,226 @@
+import math
+import queue
 import simpy
 import sys
+import threading
 import time
+from collections import namedtuple
+from itertools import islice
+from types import MappingProxyType
+from Models.steady_state import format_report
 from visualization.visual_components import TrafficVisualizer
 
+# Immutable copy of what the visualizer draws, so the renderer never touches
+# the simulation's live queues
+VehicleView = namedtuple('VehicleView', 'id prio source destination')
+Frame = namedtuple('Frame', 'time light_states vehicle_queues')
+
+
 class VisualAdapter:
-    def __init__(self, intersection, env):
+    def __init__(self, intersection, env, frame_queue_size=2, visible_vehicles=16):
+        """
+        Args:
+            intersection: Intersection to display
+            env: SimPy environment
+            frame_queue_size: frames buffered between the simulation thread and
+                the renderer in run_threaded; older frames are dropped
+            visible_vehicles: vehicles per queue copied into a frame, the
+                visualizer cannot show more than this anyway
+        """
         self.visualizer = TrafficVisualizer()
         self.intersection = intersection
         self.env = env
+        self.visible_vehicles = visible_vehicles
+
+        # Light states as reported by the intersection's controller; the
+        # visualizer only ever sees copies of them through frames
+        self.light_states = dict(intersection.light_states)
+        intersection.add_light_listener(self._light_changed)
+        self.show(self.snapshot())
+
+        # run_threaded state
+        self.frames = queue.Queue(maxsize=frame_queue_size)
+        # counted by both the simulation and the render thread
+        self.dropped_frames = 0
+        self.dropped_lock = threading.Lock()
+        self.resumed = threading.Event()
+        self.stopped = threading.Event()
+        self.finished = threading.Event()
+        self.error = None
+
+    def _light_changed(self, now, direction, state):
+        self.light_states[direction] = state
+
+    def snapshot(self):
+        """Return the current state as a Frame"""
+        vehicle_queues = {
+            direction: tuple(VehicleView(v.id, v.prio, v.source, v.destination)
+                             for v in islice(vehicles, self.visible_vehicles))
+            for direction, vehicles in self.intersection.queues.items()
+        }
+        return Frame(self.env.now, MappingProxyType(dict(self.light_states)), MappingProxyType(vehicle_queues))
+
+    def show(self, frame):
+        """Make `frame` the state drawn by the next render"""
+        self.visualizer.simulation_time = frame.time
+        self.visualizer.light_states = frame.light_states
+        self.visualizer.vehicle_queues = frame.vehicle_queues
+
+    def run_visual_simulation(self, duration=100, time_scale=1.0, fps=30, max_frame_time=0.25, monitor=None):
+        """
+        Run the simulation in real time, or accelerated/slowed down by
+        `time_scale` simulated time units per wall-clock second. Every frame
+        the simulation is advanced with env.run(until=...) to the time that
+        maps to the wall-clock time elapsed, then rendered once.
+
+        Args:
+            duration: simulated time to run for
+            time_scale: simulated time units per wall-clock second
+            fps: frame rate cap, 0 for uncapped
+            max_frame_time: longest wall-clock step taken in one frame, so a
+                stall (dragging the window, a slow frame) does not make the
+                simulation jump ahead
+            monitor: optional steady_state.SteadyStateMonitor that ends the
+                run before `duration` once its estimates are precise
+        """
+        print(f"Running visual simulation for {duration} time units at x{time_scale:g}")
+        self.visualizer.fps = fps
+        self.time_scale = time_scale
+
+        last = time.perf_counter()
+        while self.env.now < duration and self.visualizer.running:
+            if monitor is not None and monitor.done.triggered:
+                break
+            running, paused = self.visualizer.process_events()
+            if not running:
+                break
 
-        # Initialize the visualizer with our light states
-        self.visualizer.light_states = {'N': 'red', 'S': 'red', 'E': 'red', 'W': 'red'}
-
-        # Hook into intersection methods to track light state changes
-        self._patch_intersection()
+            now = time.perf_counter()
+            elapsed = min(now - last, max_frame_time)
+            last = now
 
-    def _patch_intersection(self):
-        def wrapped_scheduler():
-            print("==== Wrapped scheduler started! ====")
-            directions = ['N', 'S', 'E', 'W']
-            current_direction_index = 0
+            if not paused:
+                target = min(self.env.now + elapsed * self.time_scale, duration)
+                if target > self.env.now:
+                    self.env.run(until=target)
 
-            while True:
-                current_direction = directions[current_direction_index]
+            self.show(self.snapshot())
+            # render() throttles to the frame rate cap through clock.tick
+            self.visualizer.render(self.env.now)
 
-                # Check if there are vehicles in the current direction
-                if not self.intersection.queues[current_direction]:
-                    # No vehicles in this direction, move to the next one
-                    current_direction_index = (current_direction_index + 1) % 4
-                    yield self.env.timeout(1)  # Small delay to avoid tight loop
+        print(f"Visual simulation ended at time {self.env.now:.1f}")
+        if monitor is not None:
+            print(format_report(monitor.finish(duration)))
+
+    def publish(self, frame):
+        """Queue `frame` for the renderer, dropping the oldest one if the queue is full"""
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self._count_dropped()
+                except queue.Empty:
+                    pass
+
+    def latest_frame(self):
+        """Return the newest queued frame, discarding older ones, or None"""
+        frame = None
+        while True:
+            try:
+                newer = self.frames.get_nowait()
+            except queue.Empty:
+                return frame
+            if frame is not None:
+                self._count_dropped()
+            frame = newer
+
+    def _count_dropped(self):
+        with self.dropped_lock:
+            self.dropped_frames += 1
+
+    def _simulate(self, duration, time_scale, step, publish_interval):
+        # body of the simulation thread in run_threaded
+        try:
+            origin_wall, origin_sim = time.perf_counter(), self.env.now
+            last_publish = -math.inf
+            while self.env.now < duration and not self.stopped.is_set():
+                if not self.resumed.is_set():
+                    self.resumed.wait()
+                    # restart the pacing from where the pause left off
+                    origin_wall, origin_sim = time.perf_counter(), self.env.now
                     continue
 
-                # Turn the current direction green
-                self.intersection.traffic_lights[current_direction].release(
-                    self.intersection.red_lights[current_direction])
-                self.visualizer.light_states[current_direction] = 'green'
-                print(
-                    f"DEBUG - Loop start: Time {self.env.now:.1f}, current_direction={current_direction}, Light states: {self.visualizer.light_states}")
-                self._update_visualization()
-
-                # Process the green light for the time quantum or until the queue is empty
-                time_count = 1
-                while time_count <= self.intersection.time_quantum:
-                    yield self.env.timeout(1)
-                    self._update_visualization()
-                    time_count += 1
-
-                    # Check if the queue is empty
-                    if not self.intersection.queues[current_direction]:
+                target = min(self.env.now + step, duration)
+                if time_scale is not None:
+                    delay = origin_wall + (target - origin_sim) / time_scale - time.perf_counter()
+                    if delay > 0 and self.stopped.wait(delay):
                         break
-
-                    # Check for priority in other directions
-                    current_prio = sum(vehicle.prio for vehicle in self.intersection.queues[current_direction])
-                    priority_dir_index = self.intersection.check_prio_queue(current_prio, current_direction)
-
-                    if priority_dir_index is not None:
-                        # Priority detected, switch to that direction
-                        break
-
-                # Turn the current direction red
-                if current_direction not in self.intersection.red_lights:
-                    self.intersection.red_lights[current_direction] = self.intersection.traffic_lights[
-                        current_direction].request()
-                    yield self.intersection.red_lights[current_direction]
-                self.visualizer.light_states[current_direction] = 'red'
-                self._update_visualization()
-
-                # Update the direction index
-                if priority_dir_index is not None:
-                    current_direction_index = priority_dir_index
+                self.env.run(until=target)
+
+                now = time.perf_counter()
+                if now - last_publish >= publish_interval:
+                    self.publish(self.snapshot())
+                    last_publish = now
+            self.publish(self.snapshot())
+        except Exception as error:
+            self.error = error
+        finally:
+            self.finished.set()
+
+    def run_threaded(self, duration=100, time_scale=None, fps=30, step=None):
+        """
+        Run the simulation in a background thread that publishes frames into a
+        bounded queue, while this (the main) thread renders the newest frame
+        and drops stale ones. pygame has to stay on the main thread, so it is
+        the simulation that moves off it.
+
+        Args:
+            duration: simulated time to run for
+            time_scale: simulated time units per wall-clock second, None to
+                run the simulation as fast as possible
+            fps: frame rate cap of the renderer, 0 for uncapped; frames are
+                published at most this often
+            step: simulated time advanced between pacing and publishing
+                checks, by default one frame's worth in paced mode and 1 time
+                unit at full speed
+        """
+        speed = "full speed" if time_scale is None else f"x{time_scale:g}"
+        print(f"Running threaded visual simulation for {duration} time units at {speed}")
+        if step is None:
+            step = time_scale / (fps or 60) if time_scale is not None else 1.0
+        self.visualizer.fps = fps
+        self.resumed.set()
+        self.stopped.clear()
+        self.finished.clear()
+
+        simulation = threading.Thread(target=self._simulate, name='simulation', daemon=True,
+                                      args=(duration, time_scale, step, 1 / fps if fps else 0.0))
+        simulation.start()
+        try:
+            while self.visualizer.running:
+                running, paused = self.visualizer.process_events()
+                if not running:
+                    break
+                if paused:
+                    self.resumed.clear()
                 else:
-                    current_direction_index = (current_direction_index + 1) % 4
-
-        self.intersection.scheduler = wrapped_scheduler
-        self.intersection.scheduler_process = self.env.process(wrapped_scheduler())
-
-    def _update_visualization(self):
-        self.visualizer.vehicle_queues = self.intersection.queues.copy()
-        self.visualizer.simulation_time = self.env.now
-        self.visualizer.render(self.env.now)
-
-    def run_visual_simulation(self, duration=100):
-        print(f"Running visual simulation for {duration} time units")
-        self.env.run(until=duration)
-        print(f"Visual simulation ended at time {self.env.now:.1f}")
-
-    # def start_rendering_loop(self, fps=5):
-    #     def rendering():
-    #         while self.visualizer.running:
-    #             self._update_visualization()
-    #             self.visualizer.render(self.env.now)
-    #             yield self.env.timeout(1 / fps)
-    #
-    #     self.env.process(rendering())
-
-    #
-    def run_visual_simulation(self, duration=100, fps=5):
-        print(f"Running visual simulation for {duration} time units")
-        # Start simulation in step mode
-        step_delay = 1 / fps  # Time between steps
-
-        # Run simulation steps
-        while self.env.now < duration and self.visualizer.running:
-            running, paused = self.visualizer.process_events()
+                    self.resumed.set()
 
-            if not running:
-                break
-
-            if not paused:
-                try:
-                    self.env.step()
-                    self._update_visualization()
-                    self.visualizer.render(self.env.now)
-                except StopIteration:
+                frame = self.latest_frame()
+                if frame is not None:
+                    self.show(frame)
+                elif self.finished.is_set():
+                    # the final frame has been shown
                     break
-            else:
-                # Just update the visualization when paused
                 self.visualizer.render()
-
-            time.sleep(step_delay)  # Control simulation speed
-
-        print(f"Visual simulation ended at time {self.env.now:.1f}")
\ No newline at end of file
+        finally:
+            self.stopped.set()
+            self.resumed.set()
+            simulation.join()
+
+        if self.error is not None:
+            raise self.error
+        print(f"Visual simulation ended at time {self.env.now:.1f} ({self.dropped_frames} stale frames dropped)")